@@ -0,0 +1,106 @@
+import os
+
+import pygame
+
+from engine import colour_mappings, col_key_to_str
+from log import assets_log
+
+# Sprites are loaded once per process and packed into a single atlas surface.
+# Look them up with sprites.get(kind, col_key), e.g. sprites.get('block', ('R', 'G')),
+# which hands back a subsurface of the atlas (or None if the file couldn't be loaded,
+# in which case callers fall back to coloured rects).
+
+ASSET_DIR = 'assets'
+ATLAS_WIDTH = 256
+
+
+def sprite_files():
+    # (kind, col_key) -> candidate file names, first one that exists wins
+    files = {
+        ('wall', None): ['wall.png'],
+        ('goal', None): ['goal.png'],
+    }
+    for col_key in colour_mappings:
+        key_str = col_key_to_str(col_key)
+        # The snake sprites are saved as e.g. snake_R'.png
+        files[('snake', col_key)] = [f'snake_{key_str}.png', f"snake_{key_str}'.png"]
+        files[('block', col_key)] = [f'block_{key_str}.png']
+        files[('switch', col_key)] = [f'switch_{key_str}.png']
+    return files
+
+
+def decode_sprites(asset_dir=ASSET_DIR):
+    # -> {(kind, col_key): surface} straight from the files. Doesn't need a display, so
+    # it can run on the preload thread (see preload.py)
+    images = {}
+    for key, names in sprite_files().items():
+        paths = [os.path.join(asset_dir, name) for name in names]
+        path = next((path for path in paths if os.path.isfile(path)), None)
+        if path is None:
+            assets_log.warning("no sprite for %s (looked for %s)", key, ', '.join(paths))
+            continue
+        try:
+            images[key] = pygame.image.load(path)
+        except pygame.error as e:
+            assets_log.warning("couldn't load '%s': %s", path, e)
+    return images
+
+
+class SpriteAtlas:
+    def __init__(self):
+        self.surface = None
+        self.rects = {}
+        self.sprites = {}
+        self.loaded = False
+
+    def load(self, asset_dir=ASSET_DIR, images=None):
+        # Needs a display mode for convert_alpha(). Only does the work once. `images` are
+        # already decoded ones from decode_sprites(), otherwise they're decoded here
+        if self.loaded:
+            return
+        if images is None:
+            images = decode_sprites(asset_dir)
+        images = {key: image.convert_alpha() for key, image in images.items()}
+        self.pack(images)
+        self.loaded = True
+        assets_log.info("%d sprites packed into a %dx%d atlas", len(self.rects), self.surface.get_width(), self.surface.get_height())
+
+    def pack(self, images):
+        # Shelf packing, tallest first
+        x = y = shelf_height = 0
+        order = sorted(images, key=lambda key: -images[key].get_height())
+        for key in order:
+            width, height = images[key].get_size()
+            if x + width > ATLAS_WIDTH and x > 0:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            self.rects[key] = pygame.Rect(x, y, width, height)
+            x += width
+            shelf_height = max(shelf_height, height)
+
+        self.surface = pygame.Surface((ATLAS_WIDTH, max(y + shelf_height, 1)), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+        for key, rect in self.rects.items():
+            # Straight copy, a normal blit would blend the edges against the empty atlas
+            self.surface.blit(images[key], rect, special_flags=pygame.BLEND_RGBA_MAX)
+        self.surface = self.surface.convert_alpha()
+        self.sprites = {key: self.surface.subsurface(rect) for key, rect in self.rects.items()}
+
+    def get(self, kind, col_key=None):
+        return self.sprites.get((kind, col_key))
+
+
+sprites = SpriteAtlas()
+
+# Full-screen images (title screen etc.) are too big for the atlas, but still only load once
+image_cache = {}
+
+
+def load_image(path, alpha=True):
+    image = image_cache.get(path)
+    if image is None:
+        image = pygame.image.load(path)
+        image = image.convert_alpha() if alpha else image.convert()
+        image_cache[path] = image
+    return image
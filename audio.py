@@ -0,0 +1,182 @@
+import argparse
+import math
+import os
+import sys
+import time
+from array import array
+
+import pygame
+
+from log import assets_log
+
+# Sound. The mixer is set up once per process with a small buffer (pre_init() has to
+# run before pygame.init()), sound effects are decoded into Sound buffers up front
+# and played on a fixed pool of channels, and the title music streams from disk and
+# keeps playing across scenes instead of being reloaded.
+#
+# Effects come from assets/audio/sfx/<name>.wav/.ogg when there's a file, otherwise
+# a short tone is synthesized for them. Everything is a no-op when there's no audio
+# device (SDL_AUDIODRIVER=dummy works, for headless runs).
+#   python audio.py             # play every effect once, with timings
+
+FREQUENCY = 44100
+BUFFER = 512            # samples per mix, ~12 ms at 44.1 kHz (pygame's old default was 4096)
+VOICES = 8              # effect channels, a new effect steals one when they're all busy
+MUSIC_PATH = 'assets/audio/music/music.ogg'
+MUSIC_VOLUME = 0.35
+SFX_DIR = 'assets/audio/sfx'
+
+# name -> (notes in Hz, seconds per note, volume) for effects without a file
+SFX_TONES = {
+    'switch': ([880, 1320], 0.05, 0.5),
+    'blocks': ([330, 220, 165], 0.06, 0.6),
+    'win': ([523, 659, 784, 1047], 0.09, 0.5),
+}
+# One effect per move, the most important one: winning > blocks opening > a switch
+PRIORITY = {'switch': 1, 'blocks': 2, 'win': 3}
+EVENT_SOUNDS = {'switch': 'switch', 'blocks': 'blocks', 'win': 'win'}
+
+
+def pre_init():
+    # Before pygame.init(), which opens the mixer with whatever was asked for here
+    pygame.mixer.pre_init(FREQUENCY, -16, 2, BUFFER)
+
+
+def synthesize(notes, note_length, volume):
+    # -> Sound, the notes one after another, each faded in/out so they don't click
+    frequency, size, channels = pygame.mixer.get_init()
+    if abs(size) != 16:
+        raise ValueError(f"mixer is {size}-bit, only 16-bit is synthesized")
+    note_samples = int(frequency * note_length)
+    fade = max(1, note_samples // 10)
+    amplitude = int(32767 * volume)
+    samples = array('h')
+    for note in notes:
+        period = frequency / note
+        for n in range(note_samples):
+            envelope = min(1.0, n / fade, (note_samples - n) / fade)
+            # Sine plus a bit of its third harmonic, a little brighter than a plain beep
+            phase = 2 * math.pi * n / period
+            value = int(amplitude * envelope * (0.8 * math.sin(phase) + 0.2 * math.sin(3 * phase)))
+            samples.extend([value] * channels)
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+
+class Audio:
+    def __init__(self):
+        self.ready = False
+        self.sounds = {}
+        self.channels = []
+        self.voices = []        # per channel: (priority, start ms) of what it was last given
+        self.music_path = None
+
+    def init(self):
+        # Once per process: after pygame.init() (and pre_init()), decodes the effects
+        if self.ready:
+            return
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(FREQUENCY, -16, 2, BUFFER)
+        except pygame.error as e:
+            assets_log.warning("no audio: %s", e)
+            return
+        pygame.mixer.set_num_channels(VOICES)
+        self.channels = [pygame.mixer.Channel(i) for i in range(VOICES)]
+        self.voices = [(0, 0)] * VOICES
+        for name, tone in SFX_TONES.items():
+            self.sounds[name] = self.load_sound(name, tone)
+        self.ready = True
+        frequency, size, channels = pygame.mixer.get_init()
+        assets_log.info("mixer %d Hz %d-bit x%d, %d voices, %d effects", frequency, abs(size), channels,
+                        VOICES, len(self.sounds))
+
+    def load_sound(self, name, tone):
+        for extension in ('.wav', '.ogg'):
+            path = os.path.join(SFX_DIR, name + extension)
+            if os.path.isfile(path):
+                try:
+                    return pygame.mixer.Sound(path)
+                except pygame.error as e:
+                    assets_log.warning("couldn't load '%s': %s", path, e)
+        return synthesize(*tone)
+
+    def voice(self, priority):
+        # -> index of a free channel, else the oldest one playing something no more
+        # important than `priority`, else None (the new effect gets dropped)
+        steal = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return i
+            playing_priority, started = self.voices[i]
+            if playing_priority <= priority and (steal is None or (playing_priority, started) < self.voices[steal]):
+                steal = i
+        return steal
+
+    def play(self, name):
+        if not self.ready:
+            return
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        priority = PRIORITY.get(name, 0)
+        i = self.voice(priority)
+        if i is None:
+            return
+        # Channel.play() queues it for the mixer thread and returns straight away
+        self.channels[i].play(sound)
+        self.voices[i] = (priority, pygame.time.get_ticks())
+
+    def handle_events(self, events):
+        # Engine events of one move -> its most important effect
+        best = None
+        for event in events:
+            name = EVENT_SOUNDS.get(event[0])
+            if name and (best is None or PRIORITY[name] > PRIORITY[best]):
+                best = name
+        if best:
+            self.play(best)
+
+    def play_music(self, path=MUSIC_PATH, volume=MUSIC_VOLUME):
+        # Already playing -> carry on, coming back to the title doesn't restart it
+        if not self.ready:
+            return
+        if self.music_path == path and pygame.mixer.music.get_busy():
+            return
+        try:
+            pygame.mixer.music.load(path)
+        except pygame.error as e:
+            assets_log.warning("couldn't load music '%s': %s", path, e)
+            return
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(-1)
+        self.music_path = path
+
+
+audio = Audio()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play every sound effect once")
+    parser.add_argument('--gap', type=float, default=0.4, help="seconds between effects")
+    args = parser.parse_args(argv)
+
+    pre_init()
+    start = time.perf_counter()
+    pygame.init()
+    audio.init()
+    print(f"init + decode: {(time.perf_counter() - start) * 1000:.1f} ms, mixer {pygame.mixer.get_init()}, "
+          f"driver {os.environ.get('SDL_AUDIODRIVER', 'default')}")
+    if not audio.ready:
+        return 1
+    for name, sound in audio.sounds.items():
+        start = time.perf_counter()
+        audio.play(name)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"{name:>8}: {sound.get_length() * 1000:5.0f} ms long, play() took {elapsed:.0f} us")
+        time.sleep(args.gap)
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+import argparse
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from engine import DIRECTIONS, GameState, parse_level, read_level, apply_move
+
+# N copies of one level stepped in lockstep with NumPy, for playtesting bots and
+# agent training. Same rules as engine.py (python batchenv.py LEVEL --check runs
+# both side by side), but every per-move check is one array op over all copies.
+#
+#   env = BatchEnv(symbol_data, id_data, n=4096)
+#   obs, done, won = env.step(actions)      # actions: int array, snake * 4 + direction
+#
+# Directions are engine.DIRECTIONS order (up, down, left, right). Copies that are done
+# ignore their actions until reset(); auto_reset=True resets them inside step().
+#
+# Layout: cells are flat indices (y * width + x). Walls, goals and which block group /
+# switch sits on a cell are shared; what's left of the blocks and switches is an
+# (n, groups) / (n, switches) bool array per copy. Snake bodies are ring buffers
+# (n, snakes, max_length) with the head at head_index, plus an (n, snakes, cells)
+# occupancy array for the self-collision check.
+#
+#   python batchenv.py levels/lvl_1.txt -n 4096 --steps 500          # steps/s on one core
+#   python batchenv.py levels/lvl_1.txt -n 16384 --steps 500 -j 4    # sharded over 4 processes
+#   python batchenv.py levels/lvl_1.txt --check                      # compare with engine.py
+
+# Observation channels: walls, blocks, switches, goals, then one body and one head layer per snake
+OBS_WALLS, OBS_BLOCKS, OBS_SWITCHES, OBS_GOALS = range(4)
+
+
+class BatchEnv:
+    def __init__(self, symbol_data, id_data, n, auto_reset=False, observe=True, max_steps=None):
+        walls, snake_positions, switches, blocks, goal_positions = parse_level(symbol_data, id_data)
+        height = len(symbol_data)
+        width = max(len(row) for row in symbol_data)
+        cells = width * height
+        self.n = n
+        self.width = width
+        self.height = height
+        self.auto_reset = auto_reset
+        self.observe = observe
+        self.max_steps = max_steps
+
+        def index(pos):
+            return pos[1] * width + pos[0]
+
+        self.walls = np.zeros(cells, dtype=bool)
+        self.walls[[index(pos) for pos in walls]] = True
+        self.goals = np.zeros(cells, dtype=bool)
+        self.goals[[index(pos) for pos in goal_positions]] = True
+
+        # Block groups: every (colour, id) with blocks
+        self.block_group = np.full(cells, -1, dtype=np.int32)
+        group_of = {}
+        for col_key, ids in blocks.items():
+            for id_num, positions in ids.items():
+                group_of[(col_key, id_num)] = len(group_of)
+                self.block_group[[index(pos) for pos in positions]] = group_of[(col_key, id_num)]
+        self.group_count = len(group_of)
+
+        # Switches are pressed (and removed) one cell at a time
+        snake_keys = list(snake_positions)
+        self.snake_count = len(snake_keys)
+        self.switch_at = np.full(cells, -1, dtype=np.int32)
+        switch_blocks = []
+        switch_single = []      # snake index a single colour switch belongs to, -1 for combined ones
+        switch_needs = []       # combined: bitmask of the snakes whose heads must be there (and only them)
+        for col_key, ids in switches.items():
+            for id_num, positions in ids.items():
+                if isinstance(col_key, tuple):
+                    single = -1
+                    needs = 0
+                    for key in col_key:
+                        # A colour with no snake can never be there
+                        needs |= 1 << snake_keys.index(key) if key in snake_keys else 1 << 30
+                else:
+                    single = snake_keys.index(col_key) if col_key in snake_keys else -2
+                    needs = 0
+                for pos in positions:
+                    self.switch_at[index(pos)] = len(switch_blocks)
+                    switch_blocks.append(group_of.get((col_key, id_num), -1))
+                    switch_single.append(single)
+                    switch_needs.append(needs)
+        self.switch_count = len(switch_blocks)
+        self.switch_blocks = np.array(switch_blocks, dtype=np.int32)
+        self.switch_single = np.array(switch_single, dtype=np.int32)
+        self.switch_needs = np.array(switch_needs, dtype=np.int64)
+
+        # Every press grows at least one snake by one, so this is as long as a snake gets
+        self.max_length = 1 + 2 * self.switch_count
+        self.start_cells = np.array([index(snake_positions[key]) for key in snake_keys], dtype=np.int32)
+        self.snake_keys = snake_keys
+
+        # Direction offsets as (dx, dy) for the bounds check
+        self.dx = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+        self.dy = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+        self.rows = np.arange(n)
+        self.snake_bits = (1 << np.arange(self.snake_count)).astype(np.int64)
+
+        S, L = self.snake_count, self.max_length
+        self.block_alive = np.ones((n, self.group_count), dtype=bool)
+        self.switch_alive = np.ones((n, self.switch_count), dtype=bool)
+        self.body = np.zeros((n, S, L), dtype=np.int32)
+        self.head_index = np.zeros((n, S), dtype=np.int32)
+        self.body_length = np.ones((n, S), dtype=np.int32)      # cells the body covers
+        self.length = np.ones((n, S), dtype=np.int32)           # cells it's growing to
+        self.occupancy = np.zeros((n, S, cells), dtype=bool)
+        self.heads = np.zeros((n, S), dtype=np.int32)
+        self.done = np.zeros(n, dtype=bool)
+        self.won = np.zeros(n, dtype=bool)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        # Back to the level start, all copies or the ones in mask
+        rows = self.rows if mask is None else np.flatnonzero(mask)
+        if len(rows) == 0:
+            return self.observation() if self.observe else None
+        self.block_alive[rows] = True
+        self.switch_alive[rows] = True
+        self.body[rows] = 0
+        self.body[rows, :, 0] = self.start_cells
+        self.head_index[rows] = 0
+        self.body_length[rows] = 1
+        self.length[rows] = 1
+        self.occupancy[rows] = False
+        for s, cell in enumerate(self.start_cells):
+            self.occupancy[rows, s, cell] = True
+        self.heads[rows] = self.start_cells
+        self.done[rows] = False
+        self.won[rows] = False
+        self.steps[rows] = 0
+        return self.observation() if self.observe else None
+
+    def step(self, actions):
+        # -> (observations or None, done, won)
+        actions = np.asarray(actions)
+        snake = actions // 4
+        direction = actions % 4
+        live = ~self.done
+        rows = self.rows
+        width = self.width
+
+        head = self.heads[rows, snake]
+        x = head % width + self.dx[direction]
+        y = head // width + self.dy[direction]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < self.height)
+        target = np.where(inside, y * width + x, 0)
+
+        # Walls + remaining blocks stop every colour
+        group = self.block_group[target]
+        blocked = ~inside | self.walls[target] | ((group >= 0) & self.block_alive[rows, np.maximum(group, 0)])
+
+        # Own body, except the tail cell when the snake isn't growing
+        head_index = self.head_index[rows, snake]
+        body_length = self.body_length[rows, snake]
+        full = body_length >= self.length[rows, snake]
+        tail = self.body[rows, snake, (head_index + body_length - 1) % self.max_length]
+        blocked |= self.occupancy[rows, snake, target] & ~(full & (target == tail))
+
+        moving = live & ~blocked
+        m = np.flatnonzero(moving)
+        ms = snake[m]
+        # Tail first, the head may be moving into the cell it leaves
+        dropping = full[m]
+        self.occupancy[m[dropping], ms[dropping], tail[m][dropping]] = False
+        self.body_length[m[~dropping], ms[~dropping]] += 1
+        new_index = (head_index[m] - 1) % self.max_length
+        self.head_index[m, ms] = new_index
+        self.body[m, ms, new_index] = target[m]
+        self.occupancy[m, ms, target[m]] = True
+        self.heads[m, ms] = target[m]
+        self.steps[live] += 1
+
+        # Switches: only the copies whose moving head landed on one that's still there
+        if self.switch_count:
+            switch = self.switch_at[target[m]]
+            on_switch = switch >= 0
+            m, ms, switch = m[on_switch], ms[on_switch], switch[on_switch]
+            alive = self.switch_alive[m, switch]
+            m, ms, switch = m[alive], ms[alive], switch[alive]
+
+            single = self.switch_single[switch]
+            single_press = single == ms
+            # Combined: exactly the two colours' heads on the cell (and this head is one of them)
+            needs = self.switch_needs[switch]
+            at_cell = (self.heads[m] == self.heads[m, ms][:, None]) @ self.snake_bits
+            combined_press = (single == -1) & (at_cell == needs) & ((needs >> ms) & 1 == 1)
+            pressed = single_press | combined_press
+
+            p, ps, switch = m[pressed], ms[pressed], switch[pressed]
+            grow = np.zeros((len(p), self.snake_count), dtype=bool)
+            grow[np.arange(len(p)), ps] = single_press[pressed]
+            grow |= ((needs[pressed][:, None] >> np.arange(self.snake_count)) & 1).astype(bool) \
+                & combined_press[pressed][:, None]
+            self.press(p, switch, grow)
+
+            # Leaving a combined switch can leave exactly its two heads on it
+            m = np.flatnonzero(moving)
+            left = head[m]
+            switch = self.switch_at[left]
+            on_switch = switch >= 0
+            m, left, switch = m[on_switch], left[on_switch], switch[on_switch]
+            alive = self.switch_alive[m, switch] & (self.switch_single[switch] == -1)
+            m, left, switch = m[alive], left[alive], switch[alive]
+            needs = self.switch_needs[switch]
+            pressed = (self.heads[m] == left[:, None]) @ self.snake_bits == needs
+            p, needs = m[pressed], needs[pressed]
+            grow = ((needs[:, None] >> np.arange(self.snake_count)) & 1).astype(bool)
+            self.press(p, switch[pressed], grow)
+
+        won = live & self.goals[self.heads].all(axis=1)
+        self.won |= won
+        self.done |= won
+        if self.max_steps is not None:
+            self.done |= self.steps >= self.max_steps
+
+        done = self.done.copy()
+        won_now = self.won.copy()
+        if self.auto_reset and done.any():
+            self.reset(done)
+        return (self.observation() if self.observe else None), done, won_now
+
+    def press(self, p, switch, grow):
+        # Copies p press `switch`: it and its blocks go, grow[k] says which snakes of p[k] grow
+        self.switch_alive[p, switch] = False
+        group = self.switch_blocks[switch]
+        has_blocks = group >= 0
+        self.block_alive[p[has_blocks], group[has_blocks]] = False
+        # np.add.at: the same copy can press twice in one step (landing + leaving)
+        np.add.at(self.length, (p[:, None].repeat(self.snake_count, 1)[grow],
+                                np.nonzero(grow)[1]), 1)
+
+    def observation(self):
+        # (n, channels, height, width) uint8
+        n, S = self.n, self.snake_count
+        cells = self.width * self.height
+        obs = np.zeros((n, 4 + 2 * S, cells), dtype=np.uint8)
+        obs[:, OBS_WALLS] = self.walls
+        obs[:, OBS_GOALS] = self.goals
+        has_group = self.block_group >= 0
+        obs[:, OBS_BLOCKS, has_group] = self.block_alive[:, self.block_group[has_group]]
+        has_switch = self.switch_at >= 0
+        obs[:, OBS_SWITCHES, has_switch] = self.switch_alive[:, self.switch_at[has_switch]]
+        obs[:, 4:4 + S] = self.occupancy
+        for s in range(S):
+            obs[self.rows, 4 + S + s, self.heads[:, s]] = 1
+        return obs.reshape(n, 4 + 2 * S, self.height, self.width)
+
+    def snake_positions(self, i, s):
+        # Body of snake s in copy i as (x, y) tuples, head first (same as Snake.positions)
+        start = self.head_index[i, s]
+        cells = [self.body[i, s, (start + k) % self.max_length] for k in range(self.body_length[i, s])]
+        return [(int(cell) % self.width, int(cell) // self.width) for cell in cells]
+
+
+# ////////////////// Process-pool sharding ////////////////// #
+
+def shard_worker(connection, symbol_data, id_data, n, kwargs):
+    env = BatchEnv(symbol_data, id_data, n, **kwargs)
+    while True:
+        command, arg = connection.recv()
+        if command == 'step':
+            connection.send(env.step(arg))
+        elif command == 'reset':
+            connection.send(env.reset(arg))
+        else:
+            connection.close()
+            return
+
+
+class ShardedBatchEnv:
+    # Same step()/reset() as BatchEnv, the copies split over `workers` processes
+    def __init__(self, symbol_data, id_data, n, workers, **kwargs):
+        self.n = n
+        self.observe = kwargs.get('observe', True)
+        sizes = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+        self.bounds = np.cumsum([0] + sizes)
+        self.connections = []
+        self.processes = []
+        for size in sizes:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=shard_worker,
+                                              args=(child, symbol_data, id_data, size, kwargs), daemon=True)
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def gather(self):
+        results = [connection.recv() for connection in self.connections]
+        observations = np.concatenate([obs for obs, _, _ in results]) if self.observe else None
+        return observations, np.concatenate([done for _, done, _ in results]), \
+            np.concatenate([won for _, _, won in results])
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        for i, connection in enumerate(self.connections):
+            connection.send(('step', actions[self.bounds[i]:self.bounds[i + 1]]))
+        return self.gather()
+
+    def reset(self, mask=None):
+        for i, connection in enumerate(self.connections):
+            connection.send(('reset', None if mask is None else mask[self.bounds[i]:self.bounds[i + 1]]))
+        results = [connection.recv() for connection in self.connections]
+        return np.concatenate(results) if self.observe else None
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+        for process in self.processes:
+            process.join()
+
+
+def check(symbol_data, id_data, n=64, steps=400, seed=0):
+    # Random actions through BatchEnv and engine.apply_move side by side -> mismatches
+    rnd = np.random.default_rng(seed)
+    env = BatchEnv(symbol_data, id_data, n, observe=False)
+    states = [GameState.from_level(symbol_data, id_data) for _ in range(n)]
+    mismatches = 0
+    for _ in range(steps):
+        actions = rnd.integers(0, 4 * env.snake_count, n)
+        _, done, won = env.step(actions)
+        for i, state in enumerate(states):
+            if not state.won:
+                apply_move(state, int(actions[i]) // 4, DIRECTIONS[int(actions[i]) % 4])
+            same = (won[i] == state.won and
+                    all(env.snake_positions(i, s) == list(snake.positions) and env.length[i, s] == snake.length
+                        for s, snake in enumerate(state.snakes)))
+            if not same:
+                mismatches += 1
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step N copies of a level with NumPy")
+    parser.add_argument('level', help="levels/lvl_N.txt")
+    parser.add_argument('-n', '--copies', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('-j', '--workers', type=int, default=1)
+    parser.add_argument('--observe', action='store_true', help="build observations every step too")
+    parser.add_argument('--check', action='store_true', help="compare against engine.py with random actions")
+    args = parser.parse_args(argv)
+
+    try:
+        symbol_data, id_data = read_level(args.level)
+    except FileNotFoundError as e:
+        print(f"'{e.filename}' missing")
+        return 2
+
+    if args.check:
+        mismatches = check(symbol_data, id_data)
+        print("matches engine.py" if not mismatches else f"{mismatches} mismatches with engine.py")
+        return 1 if mismatches else 0
+
+    kwargs = {'auto_reset': True, 'observe': args.observe, 'max_steps': 1000}
+    if args.workers > 1:
+        env = ShardedBatchEnv(symbol_data, id_data, args.copies, args.workers, **kwargs)
+    else:
+        env = BatchEnv(symbol_data, id_data, args.copies, **kwargs)
+    snake_count = len(parse_level(symbol_data, id_data)[1])
+    rnd = np.random.default_rng(0)
+    actions = [rnd.integers(0, 4 * snake_count, args.copies) for _ in range(min(args.steps, 64))]
+
+    start = time.perf_counter()
+    wins = 0
+    for step in range(args.steps):
+        _, done, won = env.step(actions[step % len(actions)])
+        wins += int(won.sum())
+    elapsed = time.perf_counter() - start
+    if args.workers > 1:
+        env.close()
+    total = args.copies * args.steps
+    print(f"{args.copies} copies x {args.steps} steps, {args.workers} process(es): "
+          f"{total / elapsed:,.0f} env steps/s ({elapsed / args.steps * 1000:.2f} ms per batch step, {wins} wins)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+from engine import (UP, DOWN, LEFT, RIGHT, COL_KEYS, GameState, Snake, colour_mappings,
+                    read_level, check_collision, apply_move)
+
+# Collision / switch lookup cost vs map size. Should stay flat from the shipped
+# 20x13 levels up to 2000x2000 because every query is one grid lookup.
+#   python -m benchmarks.bench_collision
+#   python -m benchmarks.bench_collision --sizes 20x13 500x500 2000x2000
+
+
+def synthetic_state(width, height, wall_density=0.2, entities_per_colour=50, seed=0):
+    rnd = random.Random(seed)
+    walls = []
+    free = []
+    for y in range(height):
+        for x in range(width):
+            if x in (0, width - 1) or y in (0, height - 1) or rnd.random() < wall_density:
+                walls.append((x, y))
+            else:
+                free.append((x, y))
+    rnd.shuffle(free)
+
+    blocks = {}
+    switches = {}
+    for col_key in COL_KEYS:
+        for n in range(entities_per_colour):
+            id_num = str(n % 10)
+            if len(free) < 8:
+                break
+            blocks.setdefault(col_key, {}).setdefault(id_num, []).append(free.pop())
+            switches.setdefault(col_key, {}).setdefault(id_num, []).append(free.pop())
+    goal_positions = [free.pop()]
+    snakes = [Snake(colour_mappings[col_key], free.pop(), col_key) for col_key in ('R', 'G', 'B')]
+    return GameState(width, height, walls, snakes, switches, blocks, goal_positions)
+
+
+def time_per_op(func, args_list, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(args_list)) * 1e9
+
+
+def bench(state, queries=10000, repeat=5, seed=1):
+    rnd = random.Random(seed)
+    cells = [(rnd.randrange(state.width), rnd.randrange(state.height)) for _ in range(queries)]
+    collision_ns = time_per_op(check_collision, [(x, y, 0, state) for x, y in cells], repeat)
+    lookup_ns = time_per_op(state.cell, [(pos,) for pos in cells], repeat)
+
+    # Random walk; moves include stops, switch hits and block removals
+    directions = [UP, DOWN, LEFT, RIGHT]
+    moves = [(state, rnd.randrange(len(state.snakes)), rnd.choice(directions)) for _ in range(queries)]
+    move_ns = time_per_op(apply_move, moves, 1)
+    return collision_ns, lookup_ns, move_ns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collision index benchmark")
+    parser.add_argument('--sizes', nargs='*', default=['20x13', '100x100', '500x500', '2000x2000'])
+    parser.add_argument('--queries', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    print(f"{'map':>12} {'check_collision':>16} {'cell lookup':>12} {'apply_move':>12}")
+    for level in ('levels/lvl_1.txt', 'levels/lvl_4.txt'):
+        state = GameState.from_level(*read_level(level))
+        results = bench(state, args.queries)
+        print(f"{os.path.basename(level)[:-4]:>12} " + ' '.join(f"{ns:>11.0f} ns" for ns in results))
+    for size in args.sizes:
+        width, height = (int(n) for n in size.split('x'))
+        state = synthetic_state(width, height)
+        results = bench(state, args.queries)
+        print(f"{size:>12} " + ' '.join(f"{ns:>11.0f} ns" for ns in results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
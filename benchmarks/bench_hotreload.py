@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Hot reload on a big synthetic level: edit a few rows of the text files, then time
+# LevelWatcher.poll() + reload_level() patching the live state against parsing the
+# whole level again, and check the patched state matches the fresh parse.
+#   python -m benchmarks.bench_hotreload
+#   python -m benchmarks.bench_hotreload --size 1000x1000 --rows 1 10 100
+
+from engine import GameState, read_level
+from hotreload import LevelWatcher, reload_level
+from benchmarks.synthetic import generate_level
+
+EDIT = 'WWWWWtT  '     # pasted over part of each edited row: walls, a switch and a block
+
+
+def write_lines(path, lines, mtime_ns):
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    # Some filesystems only have coarse mtimes, make sure every write counts as a change
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def same_level(a, b):
+    return (a.width == b.width and a.height == b.height and a.grid == b.grid and a.walls == b.walls
+            and a.goal_positions == b.goal_positions and a.switches == b.switches and a.blocks == b.blocks)
+
+
+def main_reload(argv=None):
+    parser = argparse.ArgumentParser(description="Hot reload of edited rows vs a full re-parse")
+    parser.add_argument('--size', default='2000x2000')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 10, 100], help="rows edited per reload")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.split('x'))
+    rnd = random.Random(args.seed)
+    symbol_data, id_data = generate_level(width, height, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as level_dir:
+        symbol_path = os.path.join(level_dir, 'lvl_1.txt')
+        write_lines(symbol_path, symbol_data, 1)
+        write_lines(os.path.join(level_dir, 'lvl_1_map.txt'), id_data, 1)
+
+        start = time.perf_counter()
+        state = GameState.from_level(*read_level(symbol_path))
+        full_ms = (time.perf_counter() - start) * 1000
+        watcher = LevelWatcher(level_dir, 'lvl_1')
+        print(f"{width}x{height}: full parse {full_ms:.0f} ms")
+
+        for n, rows in enumerate(args.rows, 2):
+            for y in rnd.sample(range(1, height - 1), min(rows, height - 2)):
+                x = rnd.randrange(1, max(2, width - len(EDIT) - 1))
+                symbol_data[y] = symbol_data[y][:x] + EDIT + symbol_data[y][x + len(EDIT):]
+            write_lines(symbol_path, symbol_data, n * 10**9)
+
+            start = time.perf_counter()
+            old = watcher.poll()
+            read_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            result, changed, _ = reload_level(state, watcher, old)
+            patch_ms = (time.perf_counter() - start) * 1000
+            print(f"  {rows:>5} rows edited: {result}, {len(changed)} cells, "
+                  f"read {read_ms:.1f} ms + patch {patch_ms:.1f} ms")
+
+        ok = same_level(state, GameState.from_level(*read_level(symbol_path)))
+    print(f"  patched state {'matches' if ok else 'DIFFERS from'} a fresh parse")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_reload())
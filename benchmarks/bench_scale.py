@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Frame time (draw + present) at 1x, 2x and 4x zoom: the renderer draws the logical
+# 800x600 view and display.present() scales what changed into the window. "move" is
+# a frame after one random move (a few dirty cells), "full" redraws + presents the
+# whole view (camera scroll, resize). Dummy SDL video by default, so display.update()
+# itself is close to free and the numbers are the drawing + scaling.
+#   python -m benchmarks.bench_scale
+#   python -m benchmarks.bench_scale --zooms 1 2 3 4 --frames 500 --size 400x300
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from assets import sprites
+from display import Display
+from engine import DIRECTIONS, GameState, apply_move
+from render import Renderer
+from benchmarks.synthetic import generate_level, lay_snakes
+
+CELL_SIZE = 20
+
+
+def frame_ms(renderer, display, snakes, current_snake):
+    start = time.perf_counter()
+    display.present(renderer.draw(snakes, current_snake))
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_zoom(zoom, level, frames, seed):
+    # -> {'move': [ms], 'full': [ms]}
+    # A fresh Display opens its own window at this zoom (set_mode again)
+    display = Display(zoom)
+    screen = display.open()
+    sprites.load()
+    state = level.copy()
+    renderer = Renderer(screen, state, CELL_SIZE)
+    rnd = random.Random(seed)
+    frame_ms(renderer, display, state.snakes, 0)
+
+    times = {'move': [], 'full': []}
+    for _ in range(frames):
+        i = rnd.randrange(len(state.snakes))
+        renderer.handle_events(apply_move(state, i, rnd.choice(DIRECTIONS)))
+        # Keep the camera still, a scroll would make it a full frame
+        renderer.followed = i
+        camera = renderer.camera
+        ms = frame_ms(renderer, display, state.snakes, i)
+        times['full' if renderer.camera != camera else 'move'].append(ms)
+    for _ in range(max(1, frames // 10)):
+        renderer.needs_full_redraw = True
+        times['full'].append(frame_ms(renderer, display, state.snakes, 0))
+    return display.window.get_size(), times
+
+
+def main_scale(argv=None):
+    parser = argparse.ArgumentParser(description="Frame time at different zooms")
+    parser.add_argument('--zooms', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--size', default='200x150', help="synthetic level size in cells")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.split('x'))
+    level = GameState.from_level(*generate_level(width, height, snake_length=50, seed=args.seed))
+    lay_snakes(level, 50)
+
+    print(f"{args.size} level, {args.frames} moves per zoom (ms per frame, draw + present)")
+    print(f"{'zoom':>5} {'window':>10} {'move p50':>9} {'move p95':>9} {'full p50':>9} {'full p95':>9}")
+    for zoom in args.zooms:
+        window, times = bench_zoom(zoom, level, args.frames, args.seed)
+        stats = []
+        for kind in ('move', 'full'):
+            values = sorted(times[kind]) or [0]
+            stats.append(statistics.median(values))
+            stats.append(values[min(len(values) - 1, int(0.95 * len(values)))])
+        print(f"{zoom:>4}x {window[0]:>5}x{window[1]:<4} " + ' '.join(f"{value:>9.3f}" for value in stats))
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_scale())
@@ -0,0 +1,77 @@
+import argparse
+import sys
+import time
+
+from engine import RED, Snake
+
+# Per-move cost vs snake length: the deque + cell set body against the old
+# list rebuild + linear self-collision scan. A move is Snake.blocks() then
+# Snake.advance(), the same check-then-mutate pair apply_move() does, and should
+# be flat.
+#   python -m benchmarks.bench_snake
+#   python -m benchmarks.bench_snake --lengths 10 1000 100000 --moves 2000
+
+
+def long_snake(length):
+    # Lying along y=0 with the head at x=length-1, facing right (open plane, no walls)
+    snake = Snake(RED, (0, 0), 'R')
+    snake.length = length
+    for x in range(1, length):
+        snake.advance((x, 0))
+    return snake
+
+
+def bench_deque(length, moves):
+    snake = long_snake(length)
+    x = snake.positions[0][0]
+    start = time.perf_counter()
+    for n in range(1, moves + 1):
+        pos = (x + n, 0)
+        if snake.blocks(pos):
+            raise RuntimeError("unexpected self collision")
+        snake.advance(pos)
+    move_ns = (time.perf_counter() - start) / moves * 1e9
+
+    # Growing moves: tail stays put
+    start = time.perf_counter()
+    for n in range(moves + 1, 2 * moves + 1):
+        snake.grow()
+        pos = (x + n, 0)
+        if not snake.blocks(pos):
+            snake.advance(pos)
+    grow_ns = (time.perf_counter() - start) / moves * 1e9
+    return move_ns, grow_ns
+
+
+def bench_list(length, moves):
+    # The old way: copy for rollback, scan positions[1:], rebuild the list
+    positions = [(x, 0) for x in range(length - 1, -1, -1)]
+    x = positions[0][0]
+    start = time.perf_counter()
+    for n in range(1, moves + 1):
+        backup = list(positions)
+        new_head = (x + n, 0)
+        positions = [new_head] + positions[:length - 1]
+        if new_head in positions[1:]:
+            positions = backup
+    move_ns = (time.perf_counter() - start) / moves * 1e9
+    return move_ns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake body microbenchmark")
+    parser.add_argument('--lengths', type=int, nargs='*', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--moves', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    print(f"{'length':>8} {'move':>12} {'growing':>12} {'old list':>12}")
+    for length in args.lengths:
+        move_ns, grow_ns = bench_deque(length, args.moves)
+        # The list version gets slow fast, keep its total work bounded
+        list_ns = bench_list(length, max(10, min(args.moves, 5_000_000 // length)))
+        print(f"{length:>8} {move_ns:>9.0f} ns {grow_ns:>9.0f} ns {list_ns:>9.0f} ns")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
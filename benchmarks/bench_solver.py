@@ -0,0 +1,53 @@
+import argparse
+import sys
+import time
+
+# The solver's multi-process frontier against the serial search: same answer, and
+# about the same number of nodes expanded? Runs each level with astar() and then
+# parallel_astar() at each worker count. lvl_2 is the slow one (~2M nodes, 10+
+# minutes and ~3 GB per search on one core).
+#   python -m benchmarks.bench_solver
+#   python -m benchmarks.bench_solver --levels lvl_1 --workers 2 4 8
+
+from engine import GameState, read_level
+from solver import Level, astar, parallel_astar, peak_memory_mb
+
+# Fail when the frontier expands this many times the serial search's nodes
+MAX_NODE_RATIO = 1.1
+
+
+def run(name, search):
+    start = time.perf_counter()
+    result = search()
+    elapsed = time.perf_counter() - start
+    moves = len(result.moves) if result.solved else None
+    print(f"  {name:<12} {str(moves):>6} {result.nodes:>10} {elapsed:>9.2f}s")
+    return result
+
+
+def main_solver(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel vs serial A*: nodes expanded + time")
+    parser.add_argument('--levels', nargs='+', default=['lvl_1', 'lvl_2'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 8])
+    args = parser.parse_args(argv)
+
+    failed = False
+    for level_name in args.levels:
+        symbol_data, id_data = read_level(f'levels/{level_name}.txt')
+        print(f"{level_name}:  {'search':<12} {'moves':>6} {'nodes':>10} {'time':>10}")
+        serial = run('serial', lambda: astar(Level(GameState.from_level(symbol_data, id_data))))
+        for workers in args.workers:
+            result = run(f'{workers} workers', lambda: parallel_astar(symbol_data, id_data, workers))
+            ratio = result.nodes / max(1, serial.nodes)
+            same = result.solved == serial.solved and (not result.solved or len(result.moves) == len(serial.moves))
+            if not same or ratio > MAX_NODE_RATIO:
+                print(f"    {'different answer' if not same else f'{ratio:.2f}x the nodes'}")
+                failed = True
+    memory = peak_memory_mb()
+    if memory is not None:
+        print(f"peak {memory:.0f} MB")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_solver())
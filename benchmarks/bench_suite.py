@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Scaling benchmark over synthetic levels: parse, per-step engine cost, per-frame
+# render cost (dummy SDL video) and memory, saved as JSON to compare revisions.
+#   python -m benchmarks.bench_suite
+#   python -m benchmarks.bench_suite --sizes 20x13 500x500 4000x4000 --snake-length 1000
+#   python -m benchmarks.bench_suite --compare benchmarks/results/before.json
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from engine import UP, DOWN, LEFT, RIGHT, GameState, parse_level, check_collision, activate_switches, apply_move
+from render import Renderer, VIEW_SIZE
+from benchmarks.synthetic import generate_level, lay_snakes
+
+DEFAULT_SIZES = ['20x13', '100x100', '500x500', '1000x1000', '2000x2000', '4000x4000']
+RESULT_DIR = os.path.join('benchmarks', 'results')
+CELL_SIZE = 20          # same as the game, the renderer's camera only shows VIEW_SIZE of it
+
+# Lower is better for all of these, --compare flags anything that got slower
+METRICS = [
+    ('generate_s', 's'),
+    ('parse_level_ms', 'ms'),
+    ('from_level_ms', 'ms'),
+    ('collision_ns', 'ns'),
+    ('switch_lookup_ns', 'ns'),
+    ('step_ns', 'ns'),
+    ('render_build_ms', 'ms'),
+    ('render_full_ms', 'ms'),
+    ('render_move_us', 'us'),
+    ('render_idle_us', 'us'),
+    ('peak_load_mb', 'MB'),
+]
+
+
+def per_op(func, args_list, rounds=5):
+    # Best round, the sub-microsecond numbers are noisy otherwise
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for args in args_list:
+            func(*args)
+        elapsed = (time.perf_counter() - start) / len(args_list)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_engine(state, queries, rnd):
+    cells = [(rnd.randrange(state.width), rnd.randrange(state.height)) for _ in range(queries)]
+    collision = per_op(check_collision, [(x, y, 0, state) for x, y in cells])
+
+    # Switch trigger lookup for a head standing somewhere: put snake 0's head on random
+    # cells that aren't its own switches (a press would change the state under us)
+    snake = state.snakes[0]
+    head = snake.positions[0]
+    lookups = []
+    for pos in cells:
+        _, col_key, _ = state.cell(pos)
+        if col_key != snake.colour_key:
+            lookups.append(pos)
+
+    def lookup(pos):
+        snake.positions[0] = pos
+        activate_switches(state, 0)
+
+    switch_lookup = per_op(lookup, [(pos,) for pos in lookups])
+    snake.positions[0] = head
+
+    directions = [UP, DOWN, LEFT, RIGHT]
+    walk = state.copy()
+    moves = [(walk, rnd.randrange(len(walk.snakes)), rnd.choice(directions)) for _ in range(queries)]
+    step = per_op(apply_move, moves, 1)
+    return collision * 1e9, switch_lookup * 1e9, step * 1e9
+
+
+def bench_render(state, rnd, frames=200):
+    cell_size = CELL_SIZE
+    screen = pygame.display.set_mode(VIEW_SIZE)
+    state = state.copy()
+
+    start = time.perf_counter()
+    renderer = Renderer(screen, state, cell_size)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    renderer.draw(state.snakes, 0)
+    full = time.perf_counter() - start
+
+    directions = [UP, DOWN, LEFT, RIGHT]
+    start = time.perf_counter()
+    for _ in range(frames):
+        i = rnd.randrange(len(state.snakes))
+        renderer.handle_events(apply_move(state, i, rnd.choice(directions)))
+        renderer.draw(state.snakes, i)
+    move = (time.perf_counter() - start) / frames
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        renderer.draw(state.snakes, 0)
+    idle = (time.perf_counter() - start) / frames
+    return cell_size, build * 1e3, full * 1e3, move * 1e6, idle * 1e6
+
+
+def peak_load_mb(symbol_data, id_data):
+    # Python allocations while parsing + building the state (tracemalloc is slow, so separate from the timings)
+    tracemalloc.start()
+    state = GameState.from_level(symbol_data, id_data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return peak / (1024 * 1024)
+
+
+def rss_peak_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(width, height, args, seed):
+    rnd = random.Random(seed)
+    result = {'size': f'{width}x{height}', 'width': width, 'height': height,
+              'wall_density': args.wall_density, 'entities_per_colour': args.entities,
+              'snake_length': args.snake_length}
+
+    start = time.perf_counter()
+    symbol_data, id_data = generate_level(width, height, args.wall_density, args.entities,
+                                          args.snake_length, seed)
+    result['generate_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_level(symbol_data, id_data)
+    result['parse_level_ms'] = (time.perf_counter() - start) * 1e3
+
+    start = time.perf_counter()
+    state = GameState.from_level(symbol_data, id_data)
+    result['from_level_ms'] = (time.perf_counter() - start) * 1e3
+    result['snake_length_laid'] = lay_snakes(state, args.snake_length)
+    result['switches_placed'] = sum(len(positions) for ids in state.switches.values() for positions in ids.values())
+
+    result['collision_ns'], result['switch_lookup_ns'], result['step_ns'] = bench_engine(state, args.queries, rnd)
+    if not args.no_render:
+        (result['cell_size'], result['render_build_ms'], result['render_full_ms'],
+         result['render_move_us'], result['render_idle_us']) = bench_render(state, rnd)
+    if not args.no_memory:
+        result['peak_load_mb'] = peak_load_mb(symbol_data, id_data)
+    result['rss_peak_mb'] = rss_peak_mb()
+    return result
+
+
+def print_row(result):
+    cells = []
+    for metric, unit in METRICS:
+        value = result.get(metric)
+        cells.append(f"{value:>10.1f}" if value is not None else f"{'-':>10}")
+    print(f"{result['size']:>10} " + ' '.join(cells), flush=True)
+
+
+def compare(results, old_path, threshold):
+    with open(old_path, 'r') as file:
+        old = json.load(file)
+    old_results = {result['size']: result for result in old['results']}
+    print(f"\nvs {old_path} ({old['meta'].get('revision')}), ratio new/old, * = more than {threshold:.0%} slower")
+    regressions = 0
+    for result in results:
+        before = old_results.get(result['size'])
+        if before is None:
+            continue
+        cells = []
+        for metric, _ in METRICS:
+            if metric == 'generate_s' or not before.get(metric) or result.get(metric) is None:
+                cells.append(f"{'-':>10}")
+                continue
+            ratio = result[metric] / before[metric]
+            slower = ratio > 1 + threshold
+            regressions += slower
+            cells.append(f"{ratio:>9.2f}{'*' if slower else ' '}")
+        print(f"{result['size']:>10} " + ' '.join(cells))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark over synthetic levels")
+    parser.add_argument('--sizes', nargs='*', default=DEFAULT_SIZES)
+    parser.add_argument('--wall-density', type=float, default=0.2)
+    parser.add_argument('--entities', type=int, default=20, help="switches (and blocks) per colour, Y/C/M included")
+    parser.add_argument('--snake-length', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-render', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass (slow on big maps)")
+    parser.add_argument('-o', '--output', help=f"JSON file (default: {RESULT_DIR}/bench-<time>.json)")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    pygame.display.init()
+    print(f"{'map':>10} " + ' '.join(f"{metric.rsplit('_', 1)[0][:10]:>10}" for metric, _ in METRICS))
+    print(f"{'':>10} " + ' '.join(f"{unit:>10}" for _, unit in METRICS))
+    results = []
+    for size in args.sizes:
+        width, height = (int(n) for n in size.split('x'))
+        result = run_case(width, height, args, args.seed)
+        results.append(result)
+        print_row(result)
+
+    output = args.output or os.path.join(RESULT_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    meta = {
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'args': vars(args),
+    }
+    with open(output, 'w') as file:
+        json.dump({'meta': meta, 'results': results}, file, indent=1)
+    print(f"results -> {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
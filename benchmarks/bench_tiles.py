@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+# Snake drawing with every cell of the view covered by long, overlapping snakes:
+# the cached tiles (one blit per cell) against drawing each cell with
+# draw_snake_segment() the way the renderer used to. Dummy SDL video.
+#   python -m benchmarks.bench_tiles
+#   python -m benchmarks.bench_tiles --cell-size 10 --frames 50
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from engine import GameState
+from render import Renderer, VIEW_SIZE, draw_snake_segment
+from benchmarks.synthetic import generate_level
+
+
+def overlapping_state(width, height):
+    # Open map, snake 1 snakes along the rows, snake 2 along the columns and snake 3
+    # along the rows of the top half: every cell has 2 or 3 snakes on it
+    symbol_data, id_data = generate_level(width, height, wall_density=0, entities_per_colour=0)
+    state = GameState.from_level(symbol_data, id_data)
+    rows = [(x if y % 2 == 0 else width - 1 - x, y) for y in range(1, height - 1) for x in range(1, width - 1)]
+    columns = [(x, y if x % 2 == 0 else height - 1 - y) for x in range(1, width - 1) for y in range(1, height - 1)]
+    paths = [rows, columns, rows[:len(rows) // 2]]
+    for snake, path in zip(state.snakes, paths):
+        snake.positions = deque(reversed(path))
+        snake.cells = set(path)
+        snake.length = len(path)
+    return state
+
+
+def old_snake_pass(renderer, snakes):
+    # What draw_view() did per snake cell before the tiles
+    size = renderer.cell_size
+    x, y = renderer.camera
+    for pos, mask in renderer.cell_masks.items():
+        colour_tuples = [(snake.col, snake.colour_key) for i, snake in enumerate(snakes) if mask & 1 << i]
+        if len(colour_tuples) == 1:
+            is_head = any(renderer.heads[i] == pos for i in range(len(snakes)) if mask & 1 << i)
+        else:
+            is_head = pos in renderer.heads
+        rect = pygame.Rect(pos[0] * size - x, pos[1] * size - y, size, size)
+        draw_snake_segment(renderer.screen, rect, colour_tuples, is_head)
+
+
+def tile_pass(renderer, snakes):
+    size = renderer.cell_size
+    x, y = renderer.camera
+    # Same as draw_view()'s snake pass
+    tiles = renderer.tiles
+    heads = renderer.heads
+    blits = []
+    for pos, mask in renderer.cell_masks.items():
+        image, offset = tiles.get((mask, pos in heads)) or renderer.tile(pos, snakes)
+        blits.append((image, (pos[0] * size - x + offset[0], pos[1] * size - y + offset[1])))
+    renderer.screen.blits(blits, doreturn=False)
+
+
+def per_frame_ms(func, frames):
+    func()
+    start = time.perf_counter()
+    for _ in range(frames):
+        func()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main_tiles(argv=None):
+    parser = argparse.ArgumentParser(description="Snake cell drawing: cached tiles vs drawn per cell")
+    parser.add_argument('--cell-size', type=int, default=20)
+    parser.add_argument('--frames', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    screen = pygame.display.set_mode(VIEW_SIZE)
+    width = VIEW_SIZE[0] // args.cell_size
+    height = VIEW_SIZE[1] // args.cell_size
+    state = overlapping_state(width, height)
+    renderer = Renderer(screen, state, args.cell_size)
+    snakes = state.snakes
+    cells = len(renderer.cell_masks)
+
+    old = per_frame_ms(lambda: old_snake_pass(renderer, snakes), args.frames)
+    new = per_frame_ms(lambda: tile_pass(renderer, snakes), args.frames)
+    full = per_frame_ms(lambda: renderer.draw_view(snakes), args.frames)
+    print(f"{width}x{height} cells of {args.cell_size}px, {cells} snake cells, "
+          f"snake lengths {[snake.length for snake in snakes]}")
+    print(f"  snake cells, drawn per cell  {old:8.3f} ms/frame")
+    print(f"  snake cells, cached tiles    {new:8.3f} ms/frame  ({old / new:.1f}x)")
+    print(f"  whole view (draw_view)       {full:8.3f} ms/frame")
+    print(f"  tiles in this renderer: {len(renderer.tiles)}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_tiles())
@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Frame time of the scene transitions (title -> first level, level won -> next level)
+# with the background preloader against everything loading on the spot. Runs the
+# real scenes under the dummy SDL drivers; between transitions it idles for --play
+# seconds like a player would, which is when the preload thread gets its work done.
+#   python -m benchmarks.bench_transition
+#   python -m benchmarks.bench_transition --level-dir /tmp/levels --repeat 5
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import main
+from assets import sprites
+from levelpack import open_levels
+from preload import Preloader
+
+
+def frame(scene, events):
+    # One pass of main.run()'s loop -> (scene, ms)
+    start = time.perf_counter()
+    for event in events:
+        scene.handle_event(event)
+        scene = main.switch_scenes(scene)
+    scene.update(pygame.time.get_ticks())
+    scene = main.switch_scenes(scene)
+    dirty_rects = scene.draw()
+    main.display.present(dirty_rects)
+    return scene, (time.perf_counter() - start) * 1000
+
+
+def play_through(levels, background, play_seconds):
+    # -> [(transition, ms)] for the title click and every level won, in order
+    main.levels = levels
+    main.preloader = Preloader(levels, background)
+    # Same as main.py's startup: fresh sprite atlas, images requested straight away
+    sprites.__init__()
+    main.preloader.request_sprites()
+
+    first_level = levels.names[0]
+    scene = main.TitleScene(first_level)
+    scene.enter()
+    scene, _ = frame(scene, [])
+    time.sleep(play_seconds)
+
+    timings = []
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=scene.button_rect.center, button=1)
+    scene, ms = frame(scene, [click])
+    timings.append((f"title -> {scene.level_active}", ms))
+    while isinstance(scene, main.LevelScene):
+        scene, _ = frame(scene, [])
+        time.sleep(play_seconds)
+        won = scene.level_active
+        scene.state.won = True
+        scene, ms = frame(scene, [])
+        after = scene.level_active if isinstance(scene, main.LevelScene) else 'title'
+        timings.append((f"{won} -> {after}", ms))
+    scene.exit()
+    main.preloader.shutdown()
+    return timings
+
+
+def main_bench(argv=None):
+    parser = argparse.ArgumentParser(description="Transition frame times with and without preloading")
+    parser.add_argument('--level-dir', default=None, help="levels to play through (default: the game's)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--play', type=float, default=0.3, help="seconds spent on each screen before moving on")
+    args = parser.parse_args(argv)
+
+    levels = open_levels(args.level_dir) if args.level_dir else main.levels
+    results = {}
+    for _ in range(args.repeat):
+        for background in (False, True):
+            for transition, ms in play_through(levels, background, args.play):
+                results.setdefault(transition, {}).setdefault(background, []).append(ms)
+
+    print(f"{'transition':>24} {'on the spot':>12} {'preloaded':>12}   (median of {args.repeat}, ms)")
+    for transition, by_mode in results.items():
+        print(f"{transition:>24} {statistics.median(by_mode[False]):>12.2f} {statistics.median(by_mode[True]):>12.2f}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
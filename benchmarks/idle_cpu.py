@@ -0,0 +1,93 @@
+import argparse
+import os
+import resource
+import sys
+import time
+
+# CPU time of the real game loop sitting on a level (dummy SDL drivers): idle, then
+# optionally with a key held for part of it. --busy forces every scene to ask for
+# an update each frame, which is how the loop behaved before it could sleep.
+#   python -m benchmarks.idle_cpu                    # a minute of idle play
+#   python -m benchmarks.idle_cpu --seconds 10 --hold 5
+#   python -m benchmarks.idle_cpu --busy             # same, spinning at the scene's FPS
+#   SDL_VIDEODRIVER=x11 python -m benchmarks.idle_cpu
+# SDL's dummy video driver can't block on events, its event.wait() polls every 1 ms,
+# so run it against a real display for the idle numbers that matter.
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import main
+from profiler import profiler
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def post_later(event, delay_ms):
+    # Delivered by SDL's timer thread, the loop sees it like real input
+    pygame.time.set_timer(event, max(1, int(delay_ms)), 1)
+
+
+WARMUP_MS = 1000        # level load, sprites, first frame - not what's being measured
+MARK = pygame.USEREVENT + 1
+
+
+def main_idle(argv=None):
+    parser = argparse.ArgumentParser(description="CPU time of the game loop while idle")
+    parser.add_argument('--level', default='lvl_1')
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--hold', type=float, default=0.0, help="hold 's' for this many seconds at the end")
+    parser.add_argument('--busy', action='store_true', help="never sleep on events (the old loop)")
+    args = parser.parse_args(argv)
+
+    if args.busy:
+        main.Scene.next_update = lambda self, current_time: 0
+        main.TitleScene.next_update = main.Scene.next_update
+        main.LevelScene.next_update = main.Scene.next_update
+
+    # The measurement starts when the MARK event comes through the loop
+    marks = {}
+    handle_event = main.LevelScene.handle_event
+
+    def spy(scene, event):
+        if event.type == MARK:
+            marks['wall'] = time.perf_counter()
+            marks['cpu'] = cpu_seconds()
+            marks['passes'] = profiler.frame_count
+        handle_event(scene, event)
+
+    main.LevelScene.handle_event = spy
+
+    # Loop passes get counted through the profiler, no overlay
+    profiler.start()
+    end_ms = WARMUP_MS + args.seconds * 1000
+    post_later(pygame.event.Event(MARK), WARMUP_MS)
+    if args.hold:
+        post_later(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_s), end_ms - args.hold * 1000)
+        post_later(pygame.event.Event(pygame.KEYUP, key=pygame.K_s), end_ms)
+    post_later(pygame.event.Event(pygame.QUIT), end_ms)
+
+    try:
+        main.run(args.level, title=False)
+    except SystemExit:
+        pass
+    wall = time.perf_counter() - marks['wall']
+    cpu = cpu_seconds() - marks['cpu']
+    passes = profiler.frame_count - marks['passes']
+
+    print(f"{'busy' if args.busy else 'idle-aware'} loop, {args.level}, {wall:.1f}s "
+          f"({args.hold:.1f}s holding a key)")
+    print(f"  loop passes  {passes:>8} ({passes / wall:.1f}/s)")
+    print(f"  cpu time     {cpu:>8.2f}s ({cpu / wall:.1%} of one core)")
+    if os.environ['SDL_VIDEODRIVER'] == 'dummy':
+        print("  (dummy video driver: SDL polls inside event.wait(), idle cpu time is its floor)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_idle())
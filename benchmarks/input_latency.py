@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+# Feeds a move script to the real game loop as key presses, --burst keys per loop
+# pass (all read in one go, the way a fast player's taps arrive within a frame), then
+# checks the level ended up exactly where engine.py's run_moves() says it should and
+# prints the key -> display latency stats. Dummy SDL drivers.
+#   python -m benchmarks.input_latency
+#   python -m benchmarks.input_latency --level lvl_2 -m "1ssa2dddd..." --burst 8
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import main
+from engine import parse_moves, run_moves, state_hash
+from profiler import input_latency
+
+SOLUTION = ('1dddsd2sdd3sddddddddddwdddd1sssssssdddddwwddddssaaaaaawwwwwwdddw2ssaaaaaawwwwaaaaaaaw'
+            '1ww2dddddddwdddwww3saaaaaawwwwwwdddwww')
+KEYS = {c: getattr(pygame, 'K_' + c) for c in 'wasd123zyr'}
+
+
+def key_events(script):
+    # -> [[KEYDOWN, KEYUP] per key]
+    return [[pygame.event.Event(pygame.KEYDOWN, key=KEYS[c]), pygame.event.Event(pygame.KEYUP, key=KEYS[c])]
+            for c in script if c in KEYS]
+
+
+def main_input(argv=None):
+    parser = argparse.ArgumentParser(description="Key bursts through the game loop: correctness + latency")
+    parser.add_argument('--level', default='lvl_1')
+    parser.add_argument('-m', '--moves', default=SOLUTION, help="move script, as for engine.py")
+    parser.add_argument('--burst', type=int, default=4, help="keys read per loop pass")
+    args = parser.parse_args(argv)
+
+    presses = key_events(args.moves)
+    bursts = [sum(presses[i:i + args.burst], []) for i in range(0, len(presses), args.burst)]
+    # Level state when it's won (the game moves on to the next one) or quit, grabbed
+    # before the scene lets go of it
+    final = {}
+    level_exit = main.LevelScene.exit
+
+    def spy_exit(scene):
+        if not final.get('won'):
+            final['hash'] = state_hash(scene.state)
+            final['won'] = scene.state.won
+        level_exit(scene)
+
+    main.LevelScene.exit = spy_exit
+    passes = [0]
+
+    def feed(timeout):
+        pygame.event.get()
+        passes[0] += 1
+        # First pass loads the level, then a burst per pass, then quit
+        if passes[0] == 1:
+            return []
+        if bursts:
+            return bursts.pop(0)
+        return [pygame.event.Event(pygame.QUIT)]
+
+    main.wait_for_events = feed
+    input_latency.reset()
+    start = time.perf_counter()
+    try:
+        main.run(args.level, title=False)
+    except SystemExit:
+        pass
+    wall = time.perf_counter() - start
+
+    expected, _ = run_moves(main.levels.load(args.level), parse_moves(args.moves))
+    ok = final.get('hash') == state_hash(expected)
+    stats = input_latency.stats()
+    print(f"{args.level}: {len(presses)} keys in bursts of {args.burst}, {passes[0]} loop passes, {wall:.2f}s")
+    print(f"  final state {'matches' if ok else 'DIFFERS from'} run_moves(){' (won)' if final.get('won') else ''}")
+    print(f"  moves timed {stats['moves']}")
+    for name in ('applied', 'shown'):
+        if name in stats:
+            s = stats[name]
+            print(f"  key -> {name:<8} p50 {s['p50']:6.2f} ms  p95 {s['p95']:6.2f}  p99 {s['p99']:6.2f}  max {s['max']:6.2f}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_input())
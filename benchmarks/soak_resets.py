@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+
+# Soak test for the scene loop: press R thousands of times (and walk through the
+# level -> transition -> title cycle) under the dummy SDL drivers and watch RSS.
+# With the old recursive game() this climbed every reset and ended in RecursionError.
+#   python -m benchmarks.soak_resets
+#   python -m benchmarks.soak_resets --resets 20000 --every 1000
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import main
+
+
+def rss_mb():
+    # Current resident set size. /proc on Linux, peak RSS elsewhere (less useful but better than nothing)
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def key(key_code):
+    return pygame.event.Event(pygame.KEYDOWN, key=key_code)
+
+
+def frame(scene, events):
+    # One pass of main.run()'s loop, without the clock
+    for event in events:
+        scene.handle_event(event)
+        scene = main.switch_scenes(scene)
+    scene.update(pygame.time.get_ticks())
+    scene = main.switch_scenes(scene)
+    dirty_rects = scene.draw()
+    main.display.present(dirty_rects)
+    return scene
+
+
+def main_soak(argv=None):
+    parser = argparse.ArgumentParser(description="Reset / scene change soak test")
+    parser.add_argument('--level', default='lvl_1')
+    parser.add_argument('--resets', type=int, default=5000)
+    parser.add_argument('--every', type=int, default=500, help="print RSS every N resets")
+    parser.add_argument('--tolerance', type=float, default=5.0,
+                        help="max RSS growth (MB) after warm-up before failing")
+    args = parser.parse_args(argv)
+
+    scene = main.LevelScene(args.level, args.level)
+    scene.enter()
+    scene = frame(scene, [])
+
+    samples = []
+    for n in range(1, args.resets + 1):
+        scene = frame(scene, [key(pygame.K_r), key(pygame.K_d)])
+        # Every so often go through a win -> title -> level cycle as well
+        if n % 100 == 0:
+            scene.next_scene = main.TransitionScene(main.levels.names[-1], args.level)
+            scene = frame(scene, [])
+            button = scene.button_rect.center
+            scene = frame(scene, [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=button, button=1)])
+        if n % args.every == 0:
+            samples.append((n, rss_mb()))
+            print(f"{n:>8} resets  rss {samples[-1][1]:8.1f} MB  scene {type(scene).__name__}")
+
+    if len(samples) < 2:
+        return 0
+    # First sample is the warm-up (sprite atlas, title images, font caches...)
+    growth = samples[-1][1] - samples[0][1]
+    print(f"growth after warm-up: {growth:+.1f} MB over {samples[-1][0] - samples[0][0]} resets")
+    if growth > args.tolerance:
+        print("FAIL: RSS keeps growing")
+        return 1
+    print("OK: RSS flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_soak())
@@ -0,0 +1,100 @@
+import math
+import random
+
+from engine import COL_KEYS, switch_symbols
+
+# Synthetic levels in the normal text format (symbol rows + id map rows), for
+# benchmarking at sizes nobody would draw by hand. Layout:
+#   - border walls, then random interior walls at `wall_density`
+#   - one lane of free rows per snake along the top, wide enough for `snake_length`
+#     (lay_snakes() stretches the snakes along them after parsing)
+#   - `entities_per_colour` switches and as many blocks for every colour in COL_KEYS,
+#     combined Y/C/M included, ids cycling through 0-9 (fewer if the map is too small)
+#   - one goal
+
+SNAKE_KEYS = ('R', 'G', 'B')
+IDS = '0123456789'
+
+
+def lane_rows(width, height, snake_length):
+    # Rows per snake lane, capped so the lanes leave at least half the map
+    inner_width = width - 2
+    rows = max(1, math.ceil(snake_length / inner_width))
+    return max(1, min(rows, (height - 2) // (2 * len(SNAKE_KEYS))))
+
+
+def generate_level(width, height, wall_density=0.2, entities_per_colour=10, snake_length=1, seed=0):
+    # -> (symbol_data, id_data), same shape as read_level()
+    if width < 5 or height < 2 * len(SNAKE_KEYS) + 3:
+        raise ValueError(f"{width}x{height} is too small for a synthetic level")
+    rnd = random.Random(seed)
+    lanes = lane_rows(width, height, snake_length)
+    first_free_row = 1 + lanes * len(SNAKE_KEYS)
+
+    symbols = [['W'] * width]
+    for y in range(1, height - 1):
+        if y < first_free_row:
+            row = ['W'] + [' '] * (width - 2) + ['W']
+        else:
+            row = ['W'] + ['W' if rnd.random() < wall_density else ' ' for _ in range(width - 2)] + ['W']
+        symbols.append(row)
+    symbols.append(['W'] * width)
+    ids = [[' '] * width for _ in range(height)]
+
+    for i, col_key in enumerate(SNAKE_KEYS):
+        symbols[1 + i * lanes][1] = col_key
+
+    # Entities go on random open cells below the lanes (sampled, not listed - the
+    # big maps have millions of cells)
+    def free_cell():
+        for _ in range(1000):
+            x = rnd.randrange(1, width - 1)
+            y = rnd.randrange(first_free_row, height - 1)
+            if symbols[y][x] in (' ', 'W'):
+                return x, y
+        raise ValueError("couldn't find room for every entity")
+
+    placed = set()
+
+    def place(symbol, id_char=' '):
+        while True:
+            x, y = free_cell()
+            if (x, y) not in placed:
+                placed.add((x, y))
+                symbols[y][x] = symbol
+                ids[y][x] = id_char
+                return
+
+    # Small maps get fewer entities, a quarter of the open area at most
+    area = (width - 2) * (height - 1 - first_free_row)
+    entities_per_colour = min(entities_per_colour, area // (4 * 2 * len(COL_KEYS)))
+
+    place('O')
+    for col_key in COL_KEYS:
+        switch = switch_symbols[col_key]
+        for n in range(entities_per_colour):
+            id_char = IDS[n % len(IDS)]
+            place(switch, id_char)
+            place(switch.upper(), id_char)
+
+    return [''.join(row) for row in symbols], [''.join(row) for row in ids]
+
+
+def lay_snakes(state, snake_length):
+    # Stretch every snake along its lane (left-right, then back) to snake_length cells.
+    # -> the length actually laid (capped by the lane size)
+    width = state.width
+    lanes = lane_rows(width, state.height, snake_length)
+    laid = snake_length
+    for snake in state.snakes:
+        start_x, start_y = snake.positions[0]
+        path = []
+        for row in range(lanes):
+            xs = range(1, width - 1) if row % 2 == 0 else range(width - 2, 0, -1)
+            path.extend((x, start_y + row) for x in xs)
+        length = min(snake_length, len(path))
+        snake.length = length
+        for pos in path[1:length]:
+            snake.advance(pos)
+        laid = min(laid, length)
+    return laid
@@ -0,0 +1,115 @@
+import os
+
+import pygame
+
+from engine import BLACK
+from log import render_log
+from render import VIEW_SIZE
+
+# The window. Scenes draw into a logical VIEW_SIZE surface, cells at their native 20px
+# (the sprites' own size), and present() blows the rects that changed up by a whole
+# number zoom into the window: one nearest neighbour transform.scale per dirty rect,
+# so nothing gets scaled per sprite and a move still only touches a few cells' worth
+# of pixels. The window can be resized at any time, the logical surface keeps the
+# frame so it's just presented again at the new zoom.
+#
+# Zoom is the biggest that fits the desktop (then the window, once it's been resized),
+# letterboxed in black. PRISN_ZOOM=n asks for n: the window opens at that size and it
+# only drops lower if the window gets too small for it.
+#   PRISN_ZOOM=2 python main.py
+
+MAX_ZOOM = 8
+DESKTOP_SHARE = 0.9     # of the desktop the first window may take (task bars, title bar)
+
+
+def fit_zoom(size):
+    # -> biggest whole number zoom of VIEW_SIZE that fits in size
+    return max(1, min(MAX_ZOOM, size[0] // VIEW_SIZE[0], size[1] // VIEW_SIZE[1]))
+
+
+def zoom_setting():
+    # PRISN_ZOOM=n -> n, unset / 0 / auto -> None
+    setting = os.environ.get('PRISN_ZOOM', '')
+    if setting in ('', '0', 'auto'):
+        return None
+    try:
+        return max(1, min(MAX_ZOOM, int(setting)))
+    except ValueError:
+        render_log.warning("PRISN_ZOOM=%s isn't a number, zooming to fit", setting)
+        return None
+
+
+class Display:
+    def __init__(self, zoom=None):
+        self.manual_zoom = zoom
+        self.zoom = 1
+        self.window = None
+        self.surface = None     # logical, VIEW_SIZE
+        self.offset = (0, 0)    # where the logical surface's top-left lands in the window
+        self.full_present = True
+
+    def open(self, caption="PRISN"):
+        # -> the logical surface, the window gets opened the first time
+        if self.window is None:
+            zoom = self.manual_zoom
+            if zoom is None:
+                desktop = pygame.display.get_desktop_sizes()[0]
+                zoom = fit_zoom((int(desktop[0] * DESKTOP_SHARE), int(desktop[1] * DESKTOP_SHARE)))
+            self.window = pygame.display.set_mode((VIEW_SIZE[0] * zoom, VIEW_SIZE[1] * zoom), pygame.RESIZABLE)
+            self.surface = pygame.Surface(VIEW_SIZE).convert()
+            self.surface.fill(BLACK)
+            self.layout()
+        pygame.display.set_caption(caption)
+        return self.surface
+
+    def layout(self):
+        # Zoom + letterbox for the window's current size
+        size = self.window.get_size()
+        zoom = fit_zoom(size)
+        if self.manual_zoom:
+            zoom = min(self.manual_zoom, zoom)
+        self.zoom = zoom
+        self.offset = ((size[0] - VIEW_SIZE[0] * zoom) // 2, (size[1] - VIEW_SIZE[1] * zoom) // 2)
+        self.window.fill(BLACK)
+        self.full_present = True
+        render_log.info("window %dx%d, zoom %d", size[0], size[1], zoom)
+
+    def resized(self):
+        # VIDEORESIZE: pygame 2 has resized the window surface already
+        self.window = pygame.display.get_surface()
+        self.layout()
+
+    def present(self, rects):
+        # Logical rects -> scaled into the window -> display.update()
+        if self.full_present:
+            rects = [self.surface.get_rect()]
+        if not rects:
+            return
+        zoom = self.zoom
+        x, y = self.offset
+        bounds = self.surface.get_rect()
+        updated = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if not (rect.width and rect.height):
+                continue
+            target = pygame.Rect(x + rect.x * zoom, y + rect.y * zoom, rect.width * zoom, rect.height * zoom)
+            if zoom == 1:
+                self.window.blit(self.surface, target, rect)
+            else:
+                # Straight into the window, no scaled copy in between
+                pygame.transform.scale(self.surface.subsurface(rect), target.size, self.window.subsurface(target))
+            updated.append(target)
+        if self.full_present:
+            # Letterbox borders too
+            pygame.display.update()
+            self.full_present = False
+        else:
+            pygame.display.update(updated)
+
+    def to_logical(self, pos):
+        # Window pixel (mouse) -> logical pixel
+        return (pos[0] - self.offset[0]) // self.zoom, (pos[1] - self.offset[1]) // self.zoom
+
+
+display = Display(zoom_setting())
@@ -0,0 +1,611 @@
+import argparse
+import hashlib
+import sys
+import time
+from array import array
+from collections import deque
+
+# Headless game rules - no pygame in here so levels can be simulated without a window.
+# main.py drives this from its event loop, the CLI at the bottom runs move scripts.
+
+# Very nice colours
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+CYAN = (0, 255, 255)
+MAGENTA = (255, 0, 255)
+COL_WALL = (128, 128, 128)
+
+colour_mappings = {
+    'R': RED,
+    'G': GREEN,
+    'B': BLUE,
+    ('R', 'G'): YELLOW,
+    ('G', 'B'): CYAN,
+    ('R', 'B'): MAGENTA,
+}
+
+symbol_col_map = {
+    't': 'R', 'T': 'R',
+    'h': 'G', 'H': 'G',
+    'n': 'B', 'N': 'B',
+    'y': ('R', 'G'), 'Y': ('R', 'G'),
+    'c': ('G', 'B'), 'C': ('G', 'B'),
+    'm': ('R', 'B'), 'M': ('R', 'B'),
+}
+# col_key -> its switch's symbol (the block's is the upper case one), for writing levels
+switch_symbols = {col_key: symbol for symbol, col_key in symbol_col_map.items() if symbol.islower()}
+
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+# Combined colours go by one letter (same as the sprite file names)
+combination_map = {
+    ('R', 'G'): 'Y',
+    ('G', 'B'): 'C',
+    ('R', 'B'): 'M'
+}
+
+def col_key_to_str(col_key):
+    if isinstance(col_key, tuple):
+        return combination_map.get(col_key, ''.join(col_key))
+    else:
+        return col_key
+
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+# Same keys as the game
+key_directions = {'w': UP, 's': DOWN, 'a': LEFT, 'd': RIGHT}
+direction_keys = {direction: key for key, direction in key_directions.items()}
+
+
+class Snake:
+    # Body is a deque (head at [0], tail at [-1]) plus a set of the cells it covers,
+    # so moving, growing and self-collision don't depend on the snake's length.
+    __slots__ = ('col', 'positions', 'cells', 'direction', 'last_move_time', 'colour_key', 'length')
+
+    def __init__(self, col, start_pos, col_key):
+        self.col = col
+        self.positions = deque([start_pos])
+        self.cells = {start_pos}
+        self.direction = None
+        self.last_move_time = 0
+        self.colour_key = col_key
+        self.length = 1
+
+    def grow(self):
+        self.length += 1
+
+    def set_direction(self, new_direction):
+        if self.direction:
+            if (self.direction[0] + new_direction[0] == 0) and (self.direction[1] + new_direction[1] == 0):
+                return
+        self.direction = new_direction
+
+    def blocks(self, pos):
+        # Can't move into its own body, except the tail cell which moves out of the way
+        # (unless the snake is still growing into it)
+        if pos not in self.cells:
+            return False
+        return len(self.positions) < self.length or pos != self.positions[-1]
+
+    def advance(self, pos):
+        # Move the head to pos without checking anything, -> the cell the tail left (or None)
+        tail = None
+        if len(self.positions) >= self.length:
+            tail = self.positions.pop()
+            self.cells.discard(tail)
+        self.positions.appendleft(pos)
+        self.cells.add(pos)
+        return tail
+
+    def copy(self):
+        snake = Snake.__new__(Snake)
+        snake.col = self.col
+        snake.positions = deque(self.positions)
+        snake.cells = set(self.cells)
+        snake.direction = self.direction
+        snake.last_move_time = self.last_move_time
+        snake.colour_key = self.colour_key
+        snake.length = self.length
+        return snake
+
+
+def read_level(symbol_file_path, id_file_path=None):
+    # Raises FileNotFoundError, the game catches it and quits with a message
+    if id_file_path is None:
+        id_file_path = symbol_file_path.replace('.txt', '_map.txt')
+    with open(symbol_file_path, 'r') as file:
+        symbol_data = [line.rstrip('\n') for line in file]
+    with open(id_file_path, 'r') as file:
+        id_data = [line.rstrip('\n') for line in file]
+    return symbol_data, id_data
+
+
+def parse_level(symbol_data, id_data):
+    walls = []
+    snake_positions = {}
+    switches = {}
+    blocks = {}
+    goal_positions = []
+
+    # Check level file for character-block mappings
+    for y, (symbol_row, id_row) in enumerate(zip(symbol_data, id_data)):
+        for x, (symbol_cell, id_cell) in enumerate(zip(symbol_row, id_row)):
+            symbol = symbol_cell
+            # deal with id_char whitespace
+            id_char = id_cell.strip()
+
+            if symbol == 'W':
+                walls.append((x, y))
+            elif symbol in ('R', 'G', 'B'):
+                snake_positions[symbol] = (x, y)
+            elif symbol == 'O':
+                goal_positions.append((x, y))
+            elif symbol.islower() or symbol.isupper():
+                col_key = symbol_col_map.get(symbol)
+                if col_key:
+                    if symbol.islower():
+                        # switch
+                        switches.setdefault(col_key, {}).setdefault(id_char, []).append((x, y))
+                    else:
+                        # ...block
+                        blocks.setdefault(col_key, {}).setdefault(id_char, []).append((x, y))
+                else:
+                    # Invalid symbol
+                    pass
+    return walls, snake_positions, switches, blocks, goal_positions
+
+
+# ////////////////// Occupancy grid ////////////////// #
+# GameState.grid holds one uint16 per cell so collision + switch queries are a single lookup:
+#   bits 0-2   cell kind
+#   bits 3-5   colour index into COL_KEYS (blocks + switches)
+#   bits 6-13  id character from the _map.txt overlay (0 when blank)
+# Snake bodies aren't in the grid, each Snake keeps its own set of covered cells.
+
+CELL_EMPTY = 0
+CELL_WALL = 1
+CELL_GOAL = 2
+CELL_BLOCK = 3
+CELL_SWITCH = 4
+KIND_MASK = 0b111
+
+COL_KEYS = ['R', 'G', 'B', ('R', 'G'), ('G', 'B'), ('R', 'B')]
+col_key_index = {col_key: i for i, col_key in enumerate(COL_KEYS)}
+
+
+def encode_cell(kind, col_key=None, id_num=''):
+    code = kind
+    if col_key is not None:
+        code |= col_key_index[col_key] << 3
+    if id_num:
+        id_code = ord(id_num)
+        if id_code > 0xff:
+            raise ValueError(f"id '{id_num}' doesn't fit in the grid")
+        code |= id_code << 6
+    return code
+
+
+def decode_cell(code):
+    # -> (kind, col_key, id_num)
+    kind = code & KIND_MASK
+    if kind not in (CELL_BLOCK, CELL_SWITCH):
+        return kind, None, ''
+    id_code = code >> 6
+    return kind, COL_KEYS[(code >> 3) & 0b111], chr(id_code) if id_code else ''
+
+
+def build_grid(width, height, walls, switches, blocks, goal_positions):
+    grid = array('H', bytes(2 * width * height))
+    wall_code = encode_cell(CELL_WALL)
+    for x, y in walls:
+        grid[y * width + x] = wall_code
+    goal_code = encode_cell(CELL_GOAL)
+    for x, y in goal_positions:
+        grid[y * width + x] = goal_code
+    for kind, entities in ((CELL_BLOCK, blocks), (CELL_SWITCH, switches)):
+        for col_key, ids in entities.items():
+            for id_num, positions in ids.items():
+                code = encode_cell(kind, col_key, id_num)
+                for x, y in positions:
+                    grid[y * width + x] = code
+    return grid
+
+
+def entities_from_grid(width, grid):
+    # Inverse of build_grid(), same scan order as parse_level()
+    walls = []
+    switches = {}
+    blocks = {}
+    goal_positions = []
+    for index, code in enumerate(grid):
+        if not code:
+            continue
+        pos = (index % width, index // width)
+        kind, col_key, id_num = decode_cell(code)
+        if kind == CELL_WALL:
+            walls.append(pos)
+        elif kind == CELL_GOAL:
+            goal_positions.append(pos)
+        elif kind == CELL_SWITCH:
+            switches.setdefault(col_key, {}).setdefault(id_num, []).append(pos)
+        elif kind == CELL_BLOCK:
+            blocks.setdefault(col_key, {}).setdefault(id_num, []).append(pos)
+    return walls, switches, blocks, goal_positions
+
+
+class GameState:
+    def __init__(self, width, height, walls, snakes, switches, blocks, goal_positions, grid=None):
+        self.width = width
+        self.height = height
+        # walls + goals never change after parse_level(), copies share them
+        self.walls = walls
+        self.goal_positions = frozenset(goal_positions)
+        self.snakes = snakes
+        self.switches = switches
+        self.blocks = blocks
+        self.won = False
+        # A pre-encoded grid (level pack) is taken as is, the state owns it from here on
+        if grid is None:
+            grid = build_grid(width, height, walls, switches, blocks, goal_positions)
+        self.grid = grid
+
+    @classmethod
+    def from_level(cls, symbol_data, id_data):
+        walls, snake_positions, switches, blocks, goal_positions = parse_level(symbol_data, id_data)
+        snakes = []
+        for colour_key, pos in snake_positions.items():
+            snakes.append(Snake(colour_mappings[colour_key], pos, colour_key))
+        height = len(symbol_data)
+        width = max((len(row) for row in symbol_data), default=0)
+        return cls(width, height, walls, snakes, switches, blocks, goal_positions)
+
+    @classmethod
+    def from_grid(cls, width, height, grid, snakes):
+        walls, switches, blocks, goal_positions = entities_from_grid(width, grid)
+        return cls(width, height, walls, snakes, switches, blocks, goal_positions, grid)
+
+    def copy(self):
+        state = GameState.__new__(GameState)
+        state.width = self.width
+        state.height = self.height
+        state.walls = self.walls
+        state.goal_positions = self.goal_positions
+        state.snakes = [snake.copy() for snake in self.snakes]
+        state.switches = {col_key: {id_num: list(positions) for id_num, positions in ids.items()}
+                          for col_key, ids in self.switches.items()}
+        state.blocks = {col_key: {id_num: list(positions) for id_num, positions in ids.items()}
+                        for col_key, ids in self.blocks.items()}
+        state.won = self.won
+        state.grid = self.grid[:]
+        return state
+
+    def cell(self, pos):
+        return decode_cell(self.grid[pos[1] * self.width + pos[0]])
+
+
+def check_collision(head_x, head_y, snake_index, state):
+    if not (0 <= head_x < state.width and 0 <= head_y < state.height):
+        return 'stop'
+    index = head_y * state.width + head_x
+
+    # Walls and blocks stop every colour, only their switch removes blocks
+    kind = state.grid[index] & KIND_MASK
+    if kind == CELL_WALL or kind == CELL_BLOCK:
+        return 'stop'
+
+    if state.snakes[snake_index].blocks((head_x, head_y)):
+        return 'stop'
+
+    return 'no_collision'
+
+
+def remove_blocks(state, col_key, id_num):
+    removed = state.blocks[col_key].pop(id_num)
+    width = state.width
+    for x, y in removed:
+        state.grid[y * width + x] = CELL_EMPTY
+    return removed
+
+
+def use_switch(state, col_key, id_num, pos):
+    events = []
+    if col_key in state.blocks and id_num in state.blocks[col_key]:
+        events.append(('blocks', col_key, id_num, remove_blocks(state, col_key, id_num)))
+    positions = state.switches[col_key][id_num]
+    index = positions.index(pos)
+    del positions[index]
+    if not positions:
+        del state.switches[col_key][id_num]
+    state.grid[pos[1] * state.width + pos[0]] = CELL_EMPTY
+    # index: where pos was in the switch list, so undo_move() can put it back there
+    events.append(('switch', col_key, id_num, pos, index))
+    return events
+
+
+def press_combination(state, pos):
+    # Colour combination switches need exactly its colours' heads on the cell
+    code = state.grid[pos[1] * state.width + pos[0]]
+    if code & KIND_MASK != CELL_SWITCH:
+        return []
+    _, col_key, id_num = decode_cell(code)
+    if not isinstance(col_key, tuple):
+        return []
+    cols_at_pos = set(other.colour_key for other in state.snakes if other.positions[0] == pos)
+    if cols_at_pos != set(col_key):
+        return []
+    events = use_switch(state, col_key, id_num, pos)
+    # Add to trail for all involved snakes
+    for i, other in enumerate(state.snakes):
+        if other.colour_key in col_key:
+            other.grow()
+            events.append(('grow', i, other.length))
+    return events
+
+
+def activate_switches(state, snake_index, left=None):
+    # Only the snake that just moved can land on a new switch, or leave the right two
+    # heads behind on a combination switch (`left`: the cell its head came from)
+    snake = state.snakes[snake_index]
+    head_pos = snake.positions[0]
+    code = state.grid[head_pos[1] * state.width + head_pos[0]]
+    events = []
+    if code & KIND_MASK == CELL_SWITCH:
+        _, col_key, id_num = decode_cell(code)
+        if col_key == snake.colour_key:
+            events.extend(use_switch(state, col_key, id_num, head_pos))
+            snake.grow()
+            events.append(('grow', snake_index, snake.length))
+        elif isinstance(col_key, tuple) and snake.colour_key in col_key:
+            events.extend(press_combination(state, head_pos))
+    if left is not None:
+        events.extend(press_combination(state, left))
+    return events
+
+
+def apply_move(state, snake_index, direction):
+    # In-place version of step(), returns the list of events that happened
+    snake = state.snakes[snake_index]
+    head_x, head_y = snake.positions[0]
+    new_x, new_y = head_x + direction[0], head_y + direction[1]
+
+    if check_collision(new_x, new_y, snake_index, state) == 'stop':
+        return [('stop', snake_index)]
+
+    tail = snake.advance((new_x, new_y))
+
+    # tail: the cell the snake's tail left, None while growing
+    events = [('move', snake_index, (new_x, new_y), tail)]
+    events.extend(activate_switches(state, snake_index, (head_x, head_y)))
+
+    # Check for win
+    if all(other.positions[0] in state.goal_positions for other in state.snakes):
+        state.won = True
+        events.append(('win',))
+    return events
+
+
+def undo_move(state, events):
+    # Inverse of apply_move(): puts the state back to how it was before the move that
+    # returned `events`. -> what changed, for the renderer:
+    #   ('unmove', i, pos, tail, head)       head back off pos, tail back on (None: was growing)
+    #   ('unblocks', col_key, id, positions) / ('unswitch', col_key, id, pos)
+    undone = []
+    width = state.width
+    for event in reversed(events):
+        kind = event[0]
+        if kind == 'move':
+            _, i, pos, tail = event
+            snake = state.snakes[i]
+            snake.positions.popleft()
+            snake.cells.discard(pos)
+            if tail is not None:
+                snake.positions.append(tail)
+                snake.cells.add(tail)
+            undone.append(('unmove', i, pos, tail, snake.positions[0]))
+        elif kind == 'grow':
+            state.snakes[event[1]].length = event[2] - 1
+        elif kind == 'blocks':
+            _, col_key, id_num, removed = event
+            state.blocks[col_key][id_num] = removed
+            code = encode_cell(CELL_BLOCK, col_key, id_num)
+            for x, y in removed:
+                state.grid[y * width + x] = code
+            undone.append(('unblocks', col_key, id_num, removed))
+        elif kind == 'switch':
+            _, col_key, id_num, pos, index = event
+            state.switches[col_key].setdefault(id_num, []).insert(index, pos)
+            state.grid[pos[1] * width + pos[0]] = encode_cell(CELL_SWITCH, col_key, id_num)
+            undone.append(('unswitch', col_key, id_num, pos))
+        elif kind == 'win':
+            state.won = False
+    return undone
+
+
+class History:
+    # Undo/redo for one level. A plain move is stored as one int - which snake moved and
+    # the cell its tail left - in an array, 8 bytes a move. The head it moved to is
+    # whatever its head is when the move gets undone. The few moves that did more
+    # (switches, growing, winning) keep apply_move()'s events next to it. Undo inverts
+    # a move with undo_move(), redo plays it again with apply_move().
+    def __init__(self, width):
+        self.width = width
+        self.done = array('q')
+        self.extra = {}         # position in `done` -> events of a move that did more than move
+        self.undone = array('q')
+
+    def __len__(self):
+        return len(self.done)
+
+    def record(self, snake_index, events, clear_redo=True):
+        # events: what apply_move() returned, failed moves aren't kept
+        if events[0][0] != 'move':
+            return
+        _, _, _, tail = events[0]
+        tail_code = tail[1] * self.width + tail[0] + 1 if tail is not None else 0
+        if len(events) > 1:
+            self.extra[len(self.done)] = events
+        self.done.append(tail_code << 2 | snake_index)
+        if clear_redo:
+            del self.undone[:]
+
+    def undo(self, state):
+        # -> undo_move()'s events, or None with nothing to undo
+        if not self.done:
+            return None
+        entry = self.done.pop()
+        snake_index = entry & 0b11
+        head = state.snakes[snake_index].positions[0]
+        events = self.extra.pop(len(self.done), None)
+        if events is None:
+            tail_code = entry >> 2
+            tail = divmod(tail_code - 1, self.width)[::-1] if tail_code else None
+            events = [('move', snake_index, head, tail)]
+        undone = undo_move(state, events)
+        new_head = state.snakes[snake_index].positions[0]
+        direction = DIRECTION_INDEX[(head[0] - new_head[0], head[1] - new_head[1])]
+        self.undone.append(direction << 2 | snake_index)
+        return undone
+
+    def redo(self, state):
+        # -> apply_move()'s events, or None with nothing to redo
+        if not self.undone:
+            return None
+        entry = self.undone.pop()
+        snake_index = entry & 0b11
+        events = apply_move(state, snake_index, DIRECTIONS[entry >> 2])
+        self.record(snake_index, events, clear_redo=False)
+        return events
+
+    def clear(self):
+        del self.done[:]
+        del self.undone[:]
+        self.extra = {}
+
+
+def step(state, snake_index, direction):
+    # Pure: the given state is left alone
+    new_state = state.copy()
+    events = apply_move(new_state, snake_index, direction)
+    return new_state, events
+
+
+# ////////////////// CLI - run move scripts at full speed ////////////////// #
+
+def state_hash(state):
+    # Stable across runs + platforms, for checking replays ended up in the same place
+    digest = hashlib.sha1()
+    grid = array('H', state.grid)
+    if sys.byteorder == 'big':
+        grid.byteswap()
+    digest.update(f"{state.width}x{state.height}|{int(state.won)}|".encode())
+    digest.update(grid.tobytes())
+    for snake in state.snakes:
+        digest.update(f"|{col_key_to_str(snake.colour_key)}:{snake.length}:".encode())
+        digest.update(','.join(f"{x}.{y}" for x, y in snake.positions).encode())
+    return digest.hexdigest()
+
+
+def parse_moves(text):
+    # 1/2/3 select a snake, w/a/s/d move it, z undoes, y redoes, r resets. '#' starts a comment.
+    actions = []
+    for line in text.splitlines():
+        for char in line.split('#', 1)[0]:
+            char = char.lower()
+            if char in '123':
+                actions.append(('select', int(char) - 1))
+            elif char in key_directions:
+                actions.append(('move', key_directions[char]))
+            elif char == 'r':
+                actions.append(('reset', None))
+            elif char == 'z':
+                actions.append(('undo', None))
+            elif char == 'y':
+                actions.append(('redo', None))
+            elif not char.isspace():
+                raise ValueError(f"unknown move '{char}'")
+    return actions
+
+
+def run_moves(initial_state, actions):
+    state = initial_state.copy()
+    history = History(state.width)
+    current_snake = 0
+    steps = 0
+    for action, arg in actions:
+        if action == 'select':
+            if arg < len(state.snakes):
+                current_snake = arg
+        elif action == 'move':
+            history.record(current_snake, apply_move(state, current_snake, arg))
+            steps += 1
+            if state.won:
+                break
+        elif action == 'undo':
+            history.undo(state)
+        elif action == 'redo':
+            history.redo(state)
+            if state.won:
+                break
+        else:
+            state = initial_state.copy()
+            history.clear()
+            # The game starts a reset level on snake 1 again
+            current_snake = 0
+    return state, steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run move scripts against a level without a window")
+    parser.add_argument('level', help="levels/lvl_N.txt (the _map.txt next to it is used for ids)")
+    parser.add_argument('script', nargs='?', help="move script file, '-' for stdin")
+    parser.add_argument('-m', '--moves', help="moves inline, e.g. '1ddd2ww'")
+    parser.add_argument('-n', '--repeat', type=int, default=1, help="run the script this many times (for timing)")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.moves is not None:
+        text = args.moves
+    elif args.script == '-' or args.script is None:
+        text = sys.stdin.read()
+    else:
+        with open(args.script, 'r') as file:
+            text = file.read()
+
+    try:
+        symbol_data, id_data = read_level(args.level)
+    except FileNotFoundError as e:
+        print(f"'{e.filename}' missing")
+        return 2
+    initial_state = GameState.from_level(symbol_data, id_data)
+    try:
+        actions = parse_moves(text)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    total_steps = 0
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        state, steps = run_moves(initial_state, actions)
+        total_steps += steps
+    elapsed = time.perf_counter() - start
+
+    for snake in state.snakes:
+        print(f"{snake.colour_key}: length {snake.length} at {list(snake.positions)}")
+    print("won" if state.won else "not won")
+    print(f"hash {state_hash(state)}")
+    print(f"{total_steps} steps in {elapsed:.3f}s ({total_steps / elapsed if elapsed else 0:.0f} steps/s)")
+    return 0 if state.won else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
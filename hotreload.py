@@ -0,0 +1,226 @@
+import os
+import time
+from bisect import bisect_left, insort
+from itertools import zip_longest
+
+from engine import (CELL_WALL, CELL_GOAL, CELL_BLOCK, CELL_SWITCH, KIND_MASK, GameState, Snake,
+                    decode_cell, encode_cell, parse_level, read_level)
+from log import assets_log
+
+# Level hot reload for editing levels while playing them: PRISN_HOTRELOAD=1 python main.py
+# The active level's two text files get their mtimes polled every POLL_MS. When either
+# changes, only the rows that differ are parsed again and the cells that changed are
+# patched into the live state (grid, walls, goals, switches, blocks); the renderer
+# drops the chunks they're in. Everything else stays as it is mid-game: pressed
+# switches, opened blocks, and the snakes, unless a wall or block now sits under one
+# (that snake goes back to its start). A level that changed size, or got a different
+# set of snakes, is built from scratch instead, still keeping the snakes that fit.
+
+POLL_MS = 250
+
+
+class LevelWatcher:
+    def __init__(self, level_dir, name):
+        self.symbol_path = os.path.join(level_dir, name + '.txt')
+        self.id_path = os.path.join(level_dir, name + '_map.txt')
+        self.mtimes = self.stat()
+        self.symbol_data, self.id_data = read_level(self.symbol_path, self.id_path)
+        self.next_poll = 0
+
+    def stat(self):
+        try:
+            return os.stat(self.symbol_path).st_mtime_ns, os.stat(self.id_path).st_mtime_ns
+        except FileNotFoundError:
+            # Mid-save (some editors delete + rename), try again next poll
+            return None
+
+    def poll(self):
+        # -> (old symbol_data, old id_data) if the files changed since last time, else None.
+        # The new ones are in self.symbol_data / self.id_data
+        mtimes = self.stat()
+        if mtimes is None or mtimes == self.mtimes:
+            return None
+        self.mtimes = mtimes
+        try:
+            symbol_data, id_data = read_level(self.symbol_path, self.id_path)
+        except FileNotFoundError:
+            return None
+        old = self.symbol_data, self.id_data
+        self.symbol_data, self.id_data = symbol_data, id_data
+        return old
+
+
+def level_size(symbol_data):
+    # Same as GameState.from_level()
+    return max((len(row) for row in symbol_data), default=0), len(symbol_data)
+
+
+def row_cells(symbol_row, id_row):
+    # -> ({x: cell code}, {col_key: x} snake starts) for one row, parsed like the whole level is
+    walls, snake_positions, switches, blocks, goal_positions = parse_level([symbol_row], [id_row])
+    codes = {}
+    wall_code = encode_cell(CELL_WALL)
+    for x, _ in walls:
+        codes[x] = wall_code
+    goal_code = encode_cell(CELL_GOAL)
+    for x, _ in goal_positions:
+        codes[x] = goal_code
+    for kind, entities in ((CELL_BLOCK, blocks), (CELL_SWITCH, switches)):
+        for col_key, ids in entities.items():
+            for id_num, positions in ids.items():
+                code = encode_cell(kind, col_key, id_num)
+                for x, _ in positions:
+                    codes[x] = code
+    return codes, {col_key: x for col_key, (x, _) in snake_positions.items()}
+
+
+def row(data, y):
+    return data[y] if y < len(data) else ''
+
+
+def cell_code(symbol, id_char):
+    # -> grid code of one cell of the text files ('' when the row stops short of it)
+    return row_cells(symbol, id_char)[0].get(0, 0)
+
+
+def diff_levels(old_symbols, old_ids, new_symbols, new_ids):
+    # -> {pos: new cell code} for every cell whose file content changed. Rows that are
+    # the same are skipped whole, only the cells that differ get parsed
+    changed = {}
+    for y in range(max(len(old_symbols), len(new_symbols))):
+        old_symbol_row, new_symbol_row = row(old_symbols, y), row(new_symbols, y)
+        old_id_row, new_id_row = row(old_ids, y), row(new_ids, y)
+        if old_symbol_row == new_symbol_row and old_id_row == new_id_row:
+            continue
+        cells = zip_longest(old_symbol_row, old_id_row, new_symbol_row, new_id_row, fillvalue='')
+        for x, (old_symbol, old_id, new_symbol, new_id) in enumerate(cells):
+            if old_symbol != new_symbol or old_id != new_id:
+                code = cell_code(new_symbol, new_id)
+                if cell_code(old_symbol, old_id) != code:
+                    changed[(x, y)] = code
+    return changed
+
+
+def snake_starts(symbol_data, id_data):
+    # -> {col_key: pos}, parse_level()'s snake positions (last one wins, nothing past the
+    # end of the id row) without parsing everything
+    starts = {}
+    for y, symbol_row in enumerate(symbol_data):
+        end = len(row(id_data, y))
+        for col_key in ('R', 'G', 'B'):
+            x = symbol_row.rfind(col_key, 0, end)
+            if x >= 0:
+                starts[col_key] = (x, y)
+    return starts
+
+
+def fits(state, snake):
+    # Every cell of the snake on the map and not in a wall or block
+    width, height, grid = state.width, state.height, state.grid
+    for x, y in snake.positions:
+        if not (0 <= x < width and 0 <= y < height):
+            return False
+        kind = grid[y * width + x] & KIND_MASK
+        if kind == CELL_WALL or kind == CELL_BLOCK:
+            return False
+    return True
+
+
+def place_snakes(state, snakes, starts):
+    # state.snakes takes over `snakes` (matched by colour) where they still fit, the
+    # others start over. -> indices of the snakes that went back to their start
+    by_key = {snake.colour_key: snake for snake in snakes}
+    moved = []
+    for i, snake in enumerate(state.snakes):
+        old = by_key[snake.colour_key]
+        if fits(state, old):
+            state.snakes[i] = old
+        else:
+            state.snakes[i] = Snake(old.col, starts[old.colour_key], old.colour_key)
+            moved.append(i)
+    return moved
+
+
+def scan_order(pos):
+    # parse_level() lists walls row by row
+    return pos[1], pos[0]
+
+
+def row_walls(symbol_data, id_data, y):
+    # -> wall positions of one row of the files, like parse_level() finds them
+    symbol_row = row(symbol_data, y)[:len(row(id_data, y))]
+    return [(x, y) for x, symbol in enumerate(symbol_row) if symbol == 'W']
+
+
+def patch_walls(walls, rows, symbol_data, id_data):
+    # Swaps `rows` of the walls list for what the files have now, in place (a bottom-up
+    # slice assignment per row, the list can be millions long). Walls never change in
+    # play, so the live ones are the file's
+    for y in sorted(rows, reverse=True):
+        start = bisect_left(walls, (y, 0), key=scan_order)
+        end = bisect_left(walls, (y + 1, 0), lo=start, key=scan_order)
+        walls[start:end] = row_walls(symbol_data, id_data, y)
+
+
+def patch_state(state, changed, symbol_data, id_data):
+    # Writes the changed cells' new contents into the live state, in place
+    width = state.width
+    wall_rows = set()
+    goals = set(state.goal_positions)
+    for pos, code in changed.items():
+        index = pos[1] * width + pos[0]
+        # Out with whatever is there now (the old content may already be pressed / opened)
+        kind, col_key, id_num = decode_cell(state.grid[index])
+        if kind == CELL_WALL:
+            wall_rows.add(pos[1])
+        elif kind == CELL_GOAL:
+            goals.discard(pos)
+        elif kind in (CELL_BLOCK, CELL_SWITCH):
+            entities = state.blocks if kind == CELL_BLOCK else state.switches
+            positions = entities[col_key][id_num]
+            positions.remove(pos)
+            if not positions:
+                del entities[col_key][id_num]
+                if not entities[col_key]:
+                    del entities[col_key]
+
+        kind, col_key, id_num = decode_cell(code)
+        if kind == CELL_WALL:
+            wall_rows.add(pos[1])
+        elif kind == CELL_GOAL:
+            goals.add(pos)
+        elif kind in (CELL_BLOCK, CELL_SWITCH):
+            entities = state.blocks if kind == CELL_BLOCK else state.switches
+            insort(entities.setdefault(col_key, {}).setdefault(id_num, []), pos, key=scan_order)
+        state.grid[index] = code
+
+    # The game's live state is never copied, so its walls list can be patched where it is
+    if wall_rows:
+        patch_walls(state.walls, wall_rows, symbol_data, id_data)
+    state.goal_positions = frozenset(goals)
+
+
+def reload_level(state, watcher, old):
+    # -> ('patched', changed positions, moved snake indices) or ('rebuilt', new state, moved
+    # snake indices). `old` is what watcher.poll() returned
+    start = time.perf_counter()
+    old_symbols, old_ids = old
+    new_symbols, new_ids = watcher.symbol_data, watcher.id_data
+    starts = snake_starts(new_symbols, new_ids)
+    same_snakes = set(starts) == {snake.colour_key for snake in state.snakes}
+
+    if same_snakes and level_size(new_symbols) == (state.width, state.height):
+        changed = diff_levels(old_symbols, old_ids, new_symbols, new_ids)
+        patch_state(state, changed, new_symbols, new_ids)
+        moved = place_snakes(state, state.snakes, starts)
+        assets_log.info("level patched: %d cells changed, %d snakes moved back (%.1f ms)",
+                        len(changed), len(moved), (time.perf_counter() - start) * 1000)
+        return 'patched', list(changed), moved
+
+    new_state = GameState.from_level(new_symbols, new_ids)
+    moved = []
+    if same_snakes:
+        moved = place_snakes(new_state, state.snakes, starts)
+    assets_log.info("level rebuilt: %dx%d, %d snakes (%.1f ms)", new_state.width, new_state.height,
+                    len(new_state.snakes), (time.perf_counter() - start) * 1000)
+    return 'rebuilt', new_state, moved
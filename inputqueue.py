@@ -0,0 +1,85 @@
+import time
+from collections import deque
+
+import pygame
+
+from engine import UP, DOWN, LEFT, RIGHT
+
+# Level keys -> timestamped intents. LevelScene.handle_event() only queues what was
+# pressed, in order and tagged with the snake it was meant for, and LevelScene.update()
+# applies the whole queue on the next sim tick. So a burst of keys read in one go
+# comes out exactly as it was typed: '2' then 'd' moves snake 2, three taps of 'd'
+# are three moves, and a key let go after switching snakes stops the snake it was
+# moving rather than the one that's selected now.
+#
+# Intents are (time ns, kind, snake, arg):
+#   'select'  snake                 1/2/3
+#   'move'    snake, direction      key pressed: one move now, more on ticks while held
+#   'stop'    snake, direction      key released
+#   'undo' / 'redo' / 'reset'
+
+MOVE_KEYS = {pygame.K_w: UP, pygame.K_s: DOWN, pygame.K_a: LEFT, pygame.K_d: RIGHT}
+SELECT_KEYS = {pygame.K_1: 0, pygame.K_2: 1, pygame.K_3: 2}
+ACTION_KEYS = {pygame.K_z: 'undo', pygame.K_y: 'redo', pygame.K_r: 'reset'}
+
+
+class InputQueue:
+    def __init__(self, snake_count):
+        self.snake_count = snake_count
+        self.intents = deque()
+        # Where the keys leave things once everything queued has been applied
+        self.selected = 0
+        self.held = {}          # movement key -> snake it was pressed for
+
+    def __len__(self):
+        return len(self.intents)
+
+    def key_down(self, key, time_ns=None):
+        # -> True if it's a level key (queued)
+        if time_ns is None:
+            time_ns = time.perf_counter_ns()
+        if key in MOVE_KEYS:
+            self.held[key] = self.selected
+            self.intents.append((time_ns, 'move', self.selected, MOVE_KEYS[key]))
+        elif key in SELECT_KEYS:
+            if SELECT_KEYS[key] < self.snake_count:
+                self.selected = SELECT_KEYS[key]
+                self.intents.append((time_ns, 'select', self.selected, None))
+        elif key in ACTION_KEYS:
+            action = ACTION_KEYS[key]
+            if action == 'reset':
+                # Keys after R are for the fresh level: snake 1, nothing held
+                self.selected = 0
+                self.held = {}
+            self.intents.append((time_ns, action, self.selected, None))
+        else:
+            return False
+        return True
+
+    def key_up(self, key, time_ns=None):
+        snake = self.held.pop(key, None)
+        if snake is None:
+            return False
+        if time_ns is None:
+            time_ns = time.perf_counter_ns()
+        self.intents.append((time_ns, 'stop', snake, MOVE_KEYS[key]))
+        return True
+
+    def set_snake_count(self, snake_count, selected):
+        # The level changed under the keys (hot reload): forget whatever was queued or held
+        # for snakes it doesn't have any more. `selected`: the level's selected snake now
+        self.snake_count = snake_count
+        self.held = {key: snake for key, snake in self.held.items() if snake < snake_count}
+        self.intents = deque(intent for intent in self.intents
+                             if intent[1] not in ('select', 'move', 'stop') or intent[2] < snake_count)
+        # Where the keys that are left will leave it
+        self.selected = selected
+        for _, kind, snake, _ in self.intents:
+            if kind == 'select':
+                self.selected = snake
+            elif kind == 'reset':
+                self.selected = 0
+
+    def pop(self):
+        return self.intents.popleft()
+
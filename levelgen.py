@@ -0,0 +1,262 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from engine import DIRECTIONS, GameState, apply_move, switch_symbols
+from levelpack import LEVEL_DIR, PACK_NAME, compile_pack, level_names, level_file_re
+from solver import Level, astar, moves_to_script
+
+# Procedural levels. Candidates are built like the hand-made ones - a walled room,
+# snakes far from the goal, a chain of blocks on chokepoints, each guarding the goal
+# or the previous gate's switch - then
+# every candidate is solved with solver.py's A* on a process pool. The ones with a
+# solution at least `min_moves` long that needs at least `min_presses` switch presses
+# are written to levels/ as the next lvl_N.txt + lvl_N_map.txt.
+#   python levelgen.py -n 20                        # 20 levels at difficulty 2
+#   python levelgen.py -n 100 --difficulty 4 -j 8
+#   python levelgen.py -n 5 --out /tmp/levels --seed 123
+
+# difficulty -> size, snakes, gates (block/switch pairs), combined switches allowed,
+# wall density, minimum solution length and switch presses
+DIFFICULTY = {
+    1: {'size': (10, 8), 'snakes': 1, 'gates': 1, 'combined': False, 'walls': 0.12, 'min_moves': 8, 'min_presses': 1},
+    2: {'size': (12, 9), 'snakes': 2, 'gates': 2, 'combined': False, 'walls': 0.15, 'min_moves': 20, 'min_presses': 1},
+    3: {'size': (14, 10), 'snakes': 2, 'gates': 3, 'combined': True, 'walls': 0.18, 'min_moves': 40, 'min_presses': 2},
+    4: {'size': (16, 11), 'snakes': 3, 'gates': 3, 'combined': True, 'walls': 0.18, 'min_moves': 60, 'min_presses': 2},
+    5: {'size': (18, 12), 'snakes': 3, 'gates': 4, 'combined': True, 'walls': 0.2, 'min_moves': 80, 'min_presses': 3},
+}
+
+IDS = '123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def bfs(open_cells, starts, blocked=()):
+    # -> {cell: distance} over open_cells, not entering `blocked`
+    distance = {start: 0 for start in starts}
+    queue = deque(starts)
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in DIRECTIONS:
+            n = (x + dx, y + dy)
+            if n in open_cells and n not in distance and n not in blocked:
+                distance[n] = distance[(x, y)] + 1
+                queue.append(n)
+    return distance
+
+
+def shortest_path(open_cells, starts, goal, blocked=()):
+    parents = {start: None for start in starts}
+    queue = deque(starts)
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            path = []
+            while cell is not None:
+                path.append(cell)
+                cell = parents[cell]
+            return path[::-1]
+        x, y = cell
+        for dx, dy in DIRECTIONS:
+            n = (x + dx, y + dy)
+            if n in open_cells and n not in parents and n not in blocked:
+                parents[n] = cell
+                queue.append(n)
+    return None
+
+
+def connected(open_cells, starts, cells):
+    # Every snake can still get to every cell in `cells` with all the blocks open
+    return all(cells <= set(bfs(open_cells, [start])) for start in starts)
+
+
+def generate_candidate(settings, seed):
+    # -> (symbol_data, id_data), or None if this seed didn't give a usable layout
+    rnd = random.Random(seed)
+    width, height = settings['size']
+    open_cells = {(x, y) for x in range(1, width - 1) for y in range(1, height - 1)
+                  if rnd.random() >= settings['walls']}
+    if not open_cells:
+        return None
+    # Keep the biggest connected area, everything else is wall
+    largest = set()
+    remaining = set(open_cells)
+    while remaining:
+        area = set(bfs(open_cells, [next(iter(remaining))]))
+        remaining -= area
+        if len(area) > len(largest):
+            largest = area
+    open_cells = largest
+    if len(open_cells) < (width - 2) * (height - 2) // 2:
+        return None
+
+    cells = sorted(open_cells)
+    goal = rnd.choice(cells)
+    from_goal = bfs(open_cells, [goal])
+    # Snakes start in the far half from the goal
+    far = sorted(cells, key=from_goal.get)[len(cells) // 2:]
+    snake_keys = rnd.sample(['R', 'G', 'B'], settings['snakes'])
+    starts = rnd.sample(far, len(snake_keys))
+
+    symbols = {cell: ' ' for cell in open_cells}
+    ids = {}
+    symbols[goal] = 'O'
+    for key, cell in zip(snake_keys, starts):
+        symbols[cell] = key
+    taken = set(starts) | {goal}
+
+    gate_colours = list(snake_keys)
+    if settings['combined'] and len(snake_keys) >= 2:
+        gate_colours += [key for key in switch_symbols if isinstance(key, tuple)
+                         and all(colour in snake_keys for colour in key)]
+
+    # Gates chain backwards: the first block guards the goal, every later one guards
+    # the switch before it, so each switch has to be pressed on the way
+    blocks = set()
+    target = goal
+    for gate in range(settings['gates']):
+        colour = rnd.choice(gate_colours)
+        id_char = IDS[gate]
+        path = shortest_path(open_cells, starts, target, blocks)
+        if path is None or len(path) < 4:
+            return None
+        candidates = [cell for cell in path[2:-1] if cell not in taken]
+        if not candidates:
+            return None
+        block = rnd.choice(candidates)
+        blocks.add(block)
+        taken.add(block)
+        symbols[block] = switch_symbols[colour].upper()
+        ids[block] = id_char
+        # Wall up the ways around it, a block that can be walked around doesn't need its
+        # switch (if a way can't be closed the gate stays leaky, the solver sorts it out)
+        for _ in range(width * height):
+            bypass = shortest_path(open_cells, starts, target, blocks)
+            if bypass is None:
+                break
+            walls = [cell for cell in bypass[1:-1] if cell not in taken]
+            rnd.shuffle(walls)
+            for cell in walls:
+                open_cells.discard(cell)
+                if target in bfs(open_cells, starts, blocks - {block}) and connected(open_cells, starts, taken):
+                    symbols.pop(cell)
+                    break
+                open_cells.add(cell)
+            else:
+                break
+
+        # ...and its switch somewhere the snakes can still get to, in the far half
+        reachable = bfs(open_cells, starts, blocks)
+        spots = sorted((cell for cell in reachable if cell not in taken), key=reachable.get)
+        if not spots:
+            return None
+        switch = rnd.choice(spots[len(spots) // 2:])
+        taken.add(switch)
+        symbols[switch] = switch_symbols[colour]
+        ids[switch] = id_char
+        target = switch
+
+    symbol_data = [''.join(symbols.get((x, y), 'W') for x in range(width)) for y in range(height)]
+    id_data = [''.join(ids.get((x, y), ' ') for x in range(width)) for y in range(height)]
+    return symbol_data, id_data
+
+
+def count_presses(symbol_data, id_data, moves):
+    state = GameState.from_level(symbol_data, id_data)
+    presses = 0
+    for i, direction in moves:
+        presses += sum(1 for event in apply_move(state, i, direction) if event[0] == 'switch')
+    return presses, state.won
+
+
+def check_candidate(job):
+    # Runs in the pool: -> (seed, symbol_data, id_data, solution script, moves, presses) or (seed, None, reason)
+    settings, seed, max_nodes = job
+    candidate = generate_candidate(settings, seed)
+    if candidate is None:
+        return seed, None, 'layout'
+    symbol_data, id_data = candidate
+    result = astar(Level(GameState.from_level(symbol_data, id_data)), max_nodes)
+    if not result.solved:
+        return seed, None, 'unsolved'
+    if len(result.moves) < settings['min_moves']:
+        return seed, None, 'too short'
+    presses, won = count_presses(symbol_data, id_data, result.moves)
+    if not won:
+        return seed, None, 'engine disagrees'
+    if presses < settings['min_presses']:
+        return seed, None, 'too few presses'
+    return seed, symbol_data, id_data, moves_to_script(result.moves), len(result.moves), presses
+
+
+def next_level_number(level_dir):
+    numbers = [int(level_file_re.match(name + '.txt').group(2)) for name in level_names(level_dir)]
+    return max(numbers, default=0) + 1
+
+
+def write_level(level_dir, number, symbol_data, id_data):
+    name = f"lvl_{number}"
+    with open(os.path.join(level_dir, name + '.txt'), 'w') as file:
+        file.write('\n'.join(symbol_data) + '\n')
+    with open(os.path.join(level_dir, name + '_map.txt'), 'w') as file:
+        file.write('\n'.join(id_data) + '\n')
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate solvable levels into levels/")
+    parser.add_argument('-n', '--count', type=int, default=10, help="levels to write")
+    parser.add_argument('-d', '--difficulty', type=int, default=2, choices=sorted(DIFFICULTY))
+    parser.add_argument('--size', help="override the difficulty's size, e.g. 16x10")
+    parser.add_argument('--min-moves', type=int, help="override the minimum solution length")
+    parser.add_argument('--max-nodes', type=int, default=200000, help="search budget per candidate")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=None, help="first candidate seed (default: time based)")
+    parser.add_argument('--out', default=LEVEL_DIR, help="level directory")
+    args = parser.parse_args(argv)
+
+    settings = dict(DIFFICULTY[args.difficulty])
+    if args.size:
+        settings['size'] = tuple(int(n) for n in args.size.split('x'))
+    if args.min_moves is not None:
+        settings['min_moves'] = args.min_moves
+    first_seed = args.seed if args.seed is not None else int(time.time() * 1000)
+    os.makedirs(args.out, exist_ok=True)
+    number = next_level_number(args.out)
+
+    jobs = ((settings, seed, args.max_nodes) for seed in itertools.count(first_seed))
+    rejected = {}
+    accepted = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        for outcome in pool.imap_unordered(check_candidate, jobs, chunksize=4):
+            if outcome[1] is None:
+                rejected[outcome[2]] = rejected.get(outcome[2], 0) + 1
+                continue
+            seed, symbol_data, id_data, script, moves, presses = outcome
+            name = write_level(args.out, number, symbol_data, id_data)
+            number += 1
+            accepted += 1
+            print(f"{name}: {moves} moves, {presses} presses (seed {seed})  {script}", flush=True)
+            if accepted >= args.count:
+                pool.terminate()
+                break
+
+    elapsed = time.perf_counter() - start
+    tried = accepted + sum(rejected.values())
+    print(f"{accepted} levels from {tried} candidates in {elapsed:.1f}s "
+          f"({accepted / elapsed * 3600:.0f}/hour), rejected: "
+          + ', '.join(f"{count} {reason}" for reason, count in sorted(rejected.items())))
+
+    # Keep a compiled pack in step, the game would fall back to the text files otherwise
+    if os.path.isfile(os.path.join(args.out, PACK_NAME)):
+        compile_pack(args.out)
+        print(f"rebuilt {os.path.join(args.out, PACK_NAME)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
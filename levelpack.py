@@ -0,0 +1,232 @@
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+
+from engine import COL_KEYS, GameState, Snake, colour_mappings, col_key_index, read_level
+from log import assets_log
+
+# Levels are authored as text pairs (lvl_N.txt + lvl_N_map.txt) and compiled into one
+# binary pack for the game:
+#   python levelpack.py                     # levels/lvl_*.txt -> levels/levels.pack
+#   python levelpack.py --check             # decode every packed level and compare with the text
+#
+# Pack layout (little-endian):
+#   header    magic 'PRISNPAK', version u16, level count u16
+#   index     per level: record offset u32, record size u32, name (32 bytes, NUL padded)
+#   records   per level: width u16, height u16, snake count u16,
+#             grid (width * height u16, same cell codes as GameState.grid, ids included),
+#             snakes (colour index u8, pad u8, x u16, y u16) in file scan order
+# Records start on 4 byte boundaries so the grid can be read straight out of the mmap.
+
+LEVEL_DIR = 'levels'
+PACK_NAME = 'levels.pack'
+
+MAGIC = b'PRISNPAK'
+VERSION = 1
+HEADER = struct.Struct('<8sHH')
+INDEX_ENTRY = struct.Struct('<II32s')
+LEVEL_HEADER = struct.Struct('<HHH')
+SNAKE_RECORD = struct.Struct('<BxHH')
+
+level_file_re = re.compile(r'^(.*?)(\d+)\.txt$')
+
+
+def level_names(level_dir=LEVEL_DIR):
+    # lvl_1, lvl_2, ... lvl_10 in number order (one listdir, no probing)
+    names = []
+    for file_name in os.listdir(level_dir):
+        match = level_file_re.match(file_name)
+        if match and not file_name.endswith('_map.txt'):
+            names.append((match.group(1), int(match.group(2)), file_name[:-4]))
+    return [name for _, _, name in sorted(names)]
+
+
+def encode_level(state):
+    grid = array('H', state.grid)
+    if sys.byteorder == 'big':
+        grid.byteswap()
+    parts = [LEVEL_HEADER.pack(state.width, state.height, len(state.snakes)), grid.tobytes()]
+    for snake in state.snakes:
+        x, y = snake.positions[0]
+        parts.append(SNAKE_RECORD.pack(col_key_index[snake.colour_key], x, y))
+    return b''.join(parts)
+
+
+def decode_level(buffer, offset):
+    width, height, snake_count = LEVEL_HEADER.unpack_from(buffer, offset)
+    offset += LEVEL_HEADER.size
+    grid_size = 2 * width * height
+    # One memcpy out of the mapping - the state removes blocks from its grid, so it can't alias the pack
+    grid = array('H')
+    grid.frombytes(buffer[offset:offset + grid_size])
+    if sys.byteorder == 'big':
+        grid.byteswap()
+    offset += grid_size
+
+    snakes = []
+    for _ in range(snake_count):
+        col_index, x, y = SNAKE_RECORD.unpack_from(buffer, offset)
+        offset += SNAKE_RECORD.size
+        col_key = COL_KEYS[col_index]
+        snakes.append(Snake(colour_mappings[col_key], (x, y), col_key))
+    return GameState.from_grid(width, height, grid, snakes)
+
+
+def compile_pack(level_dir=LEVEL_DIR, pack_path=None):
+    if pack_path is None:
+        pack_path = os.path.join(level_dir, PACK_NAME)
+    names = level_names(level_dir)
+    records = []
+    for name in names:
+        state = GameState.from_level(*read_level(os.path.join(level_dir, name + '.txt')))
+        records.append(encode_level(state))
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(names)
+    index = []
+    body = []
+    for name, record in zip(names, records):
+        padding = -offset % 4
+        body.append(b'\0' * padding)
+        offset += padding
+        encoded_name = name.encode('utf-8')
+        if len(encoded_name) > 32:
+            raise ValueError(f"level name '{name}' is longer than 32 bytes")
+        index.append(INDEX_ENTRY.pack(offset, len(record), encoded_name))
+        body.append(record)
+        offset += len(record)
+
+    with open(pack_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(names)))
+        file.writelines(index)
+        file.writelines(body)
+    return pack_path, names
+
+
+class LevelPack:
+    # Only the header + index are read up front, levels are decoded on load()
+    def __init__(self, pack_path):
+        self.path = pack_path
+        with open(pack_path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"'{pack_path}' isn't a version {VERSION} level pack")
+        self.records = {}
+        self.names = []
+        for i in range(count):
+            offset, size, name = INDEX_ENTRY.unpack_from(self.data, HEADER.size + i * INDEX_ENTRY.size)
+            name = name.rstrip(b'\0').decode('utf-8')
+            self.records[name] = offset
+            self.names.append(name)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+    def load(self, name):
+        # Raises KeyError for a level that isn't in the pack
+        return decode_level(self.data, self.records[name])
+
+    def next_level(self, name):
+        i = self.positions[name] + 1
+        return self.names[i] if i < len(self.names) else None
+
+    def close(self):
+        self.data.close()
+
+
+class TextLevels:
+    # Same interface as LevelPack, straight from the authoring files
+    def __init__(self, level_dir=LEVEL_DIR):
+        self.level_dir = level_dir
+        self.names = level_names(level_dir)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+    def load(self, name):
+        # Raises FileNotFoundError
+        return GameState.from_level(*read_level(os.path.join(self.level_dir, name + '.txt')))
+
+    def next_level(self, name):
+        i = self.positions.get(name, len(self.names)) + 1
+        return self.names[i] if i < len(self.names) else None
+
+    def close(self):
+        pass
+
+
+def pack_is_stale(level_dir=LEVEL_DIR, pack_path=None):
+    if pack_path is None:
+        pack_path = os.path.join(level_dir, PACK_NAME)
+    pack_time = os.stat(pack_path).st_mtime
+    with os.scandir(level_dir) as entries:
+        if any(entry.name.endswith('.txt') and entry.stat().st_mtime > pack_time for entry in entries):
+            return True
+    # A level deleted or renamed since doesn't touch any file's mtime
+    pack = LevelPack(pack_path)
+    names = pack.names
+    pack.close()
+    return names != level_names(level_dir)
+
+
+def open_levels(level_dir=LEVEL_DIR, pack_path=None):
+    # The pack if there's an up to date one, otherwise the text files
+    if pack_path is None:
+        pack_path = os.path.join(level_dir, PACK_NAME)
+    if os.path.isfile(pack_path):
+        if not pack_is_stale(level_dir, pack_path):
+            return LevelPack(pack_path)
+        assets_log.warning("'%s' doesn't match the level files, using the text levels (rebuild with: python levelpack.py)", pack_path)
+    return TextLevels(level_dir)
+
+
+def same_state(a, b):
+    return (a.width == b.width and a.height == b.height and a.grid == b.grid and a.walls == b.walls
+            and a.goal_positions == b.goal_positions and a.switches == b.switches and a.blocks == b.blocks
+            and [(s.colour_key, s.positions) for s in a.snakes] == [(s.colour_key, s.positions) for s in b.snakes])
+
+
+def check_pack(level_dir, pack_path, repeat=200):
+    pack = LevelPack(pack_path)
+    text = TextLevels(level_dir)
+    ok = True
+    for name in pack.names:
+        matches = same_state(pack.load(name), text.load(name))
+        ok = ok and matches
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            text.load(name)
+        text_us = (time.perf_counter() - start) / repeat * 1e6
+        start = time.perf_counter()
+        for _ in range(repeat):
+            pack.load(name)
+        pack_us = (time.perf_counter() - start) / repeat * 1e6
+        print(f"{name:>12}: {'ok' if matches else 'MISMATCH'}  text {text_us:7.1f} us  pack {pack_us:7.1f} us")
+    pack.close()
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the text levels into a binary level pack")
+    parser.add_argument('level_dir', nargs='?', default=LEVEL_DIR)
+    parser.add_argument('-o', '--output', help=f"pack file (default: <level_dir>/{PACK_NAME})")
+    parser.add_argument('--check', action='store_true', help="compare the packed levels with the text ones")
+    args = parser.parse_args(argv)
+
+    pack_path = args.output or os.path.join(args.level_dir, PACK_NAME)
+    if args.check:
+        return 0 if check_pack(args.level_dir, pack_path) else 1
+    try:
+        pack_path, names = compile_pack(args.level_dir, pack_path)
+    except FileNotFoundError as e:
+        print(f"'{e.filename}' missing")
+        return 2
+    print(f"{len(names)} levels -> {pack_path} ({os.path.getsize(pack_path)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
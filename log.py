@@ -0,0 +1,119 @@
+import logging
+import os
+import sys
+from collections import deque
+
+# Log channels, all under the 'prisn' logger:
+#   prisn.engine   moves, switches, wins, level changes
+#   prisn.input    key presses, snake selection, resets
+#   prisn.render   drawing oddities
+#   prisn.assets   sprite + level loading
+# Per-move / per-frame messages are DEBUG, so with the default WARNING level they
+# stop at one cached isEnabledFor() check and never get formatted or written.
+#
+# Configure with environment variables:
+#   PRISN_LOG=debug                    everything
+#   PRISN_LOG=engine=debug,input=info  per channel (anything else stays at WARNING)
+#   PRISN_LOG_RING=2000                keep the last 2000 records of every level in memory,
+#                                      written to prisn_crash.log if the game dies
+
+CHANNELS = ('engine', 'input', 'render', 'assets')
+
+engine_log = logging.getLogger('prisn.engine')
+input_log = logging.getLogger('prisn.input')
+render_log = logging.getLogger('prisn.render')
+assets_log = logging.getLogger('prisn.assets')
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+
+FORMAT = '%(relativeCreated)9.0fms %(name)s %(levelname)s: %(message)s'
+CRASH_LOG = 'prisn_crash.log'
+
+
+class RingBufferHandler(logging.Handler):
+    # Holds the last `capacity` records, only formatted when dumped
+    def __init__(self, capacity=1000):
+        super().__init__(logging.DEBUG)
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, stream):
+        for record in list(self.records):
+            stream.write(self.format(record) + '\n')
+
+
+class ChannelFilter(logging.Filter):
+    # Per channel levels for the console when the loggers themselves are opened up for the ring buffer
+    def __init__(self, levels, default):
+        super().__init__()
+        self.levels = levels
+        self.default = default
+
+    def filter(self, record):
+        channel = record.name.rpartition('.')[2]
+        return record.levelno >= self.levels.get(channel, self.default)
+
+
+def parse_spec(spec):
+    # 'debug' or 'engine=debug,input=info' -> {channel: level}, '' is the default for the rest
+    levels = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        channel, _, level_name = part.rpartition('=')
+        level = logging.getLevelName(level_name.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"unknown log level '{level_name}'")
+        if channel and channel not in CHANNELS:
+            raise ValueError(f"unknown log channel '{channel}' (expected one of {', '.join(CHANNELS)})")
+        levels[channel] = level
+    return levels
+
+
+ring = None
+
+
+def setup_logging(spec=None, ring_size=None, stream=None):
+    global ring
+    if spec is None:
+        spec = os.environ.get('PRISN_LOG', 'warning')
+    if ring_size is None:
+        ring_size = int(os.environ.get('PRISN_LOG_RING', '0') or 0)
+
+    levels = parse_spec(spec)
+    default = levels.pop('', logging.WARNING)
+
+    root = logging.getLogger('prisn')
+    # Safe to call again (e.g. tests / benchmarks switching configs)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.propagate = False
+    root.setLevel(logging.DEBUG)
+
+    console = logging.StreamHandler(stream or sys.stderr)
+    console.setFormatter(logging.Formatter(FORMAT))
+    console.addFilter(ChannelFilter(levels, default))
+    root.addHandler(console)
+
+    ring = None
+    if ring_size > 0:
+        ring = RingBufferHandler(ring_size)
+        ring.setFormatter(logging.Formatter(FORMAT))
+        root.addHandler(ring)
+
+    for channel in CHANNELS:
+        # The ring buffer wants everything, otherwise keep the hot path checks failing early
+        logging.getLogger('prisn.' + channel).setLevel(logging.DEBUG if ring else levels.get(channel, default))
+
+
+def dump_ring(path=CRASH_LOG):
+    # -> path written, or None without a ring buffer
+    if ring is None or not ring.records:
+        return None
+    with open(path, 'w') as file:
+        ring.dump(file)
+    return path
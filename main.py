@@ -1,617 +1,466 @@
-import pygame
-import sys
-import os
-
-from pygame.locals import *
-from pygame import mixer
-
-# SETTINGS #
-#//////////////////////////////////////////////////////////////////////////////
-GRID_SQUARE_SIZE = 20
-FPS = 60
-MOVE_DELAY = 100
-#//////////////////////////////////////////////////////////////////////////////
-
-# Very nice colours
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
-CYAN = (0, 255, 255)
-MAGENTA = (255, 0, 255)
-COL_WALL = (128, 128, 128)
-
-colour_mappings = {
-    'R': RED,
-    'G': GREEN,
-    'B': BLUE,
-    ('R', 'G'): YELLOW,
-    ('G', 'B'): CYAN,
-    ('R', 'B'): MAGENTA,
-}
-
-symbol_col_map = {
-    't': 'R', 'T': 'R',
-    'h': 'G', 'H': 'G',
-    'n': 'B', 'N': 'B',
-    'y': ('R', 'G'), 'Y': ('R', 'G'),
-    'c': ('G', 'B'), 'C': ('G', 'B'),
-    'm': ('R', 'B'), 'M': ('R', 'B'),
-}
-
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
-
-pygame.init()
-
-class Snake:
-    def __init__(self, col, start_pos, col_key):
-        self.col = col
-        self.positions = [start_pos]
-        self.direction = None
-        self.last_move_time = 0
-        self.colour_key = col_key
-        self.length = 1
-
-    def move(self):
-        if self.direction:
-            head_x, head_y = self.positions[0]
-            dir_x, dir_y = self.direction
-            new_head = (head_x + dir_x, head_y + dir_y)
-            self.positions = [new_head] + self.positions[:self.length - 1]
-
-    def grow(self):
-        self.length += 1
-
-    def set_direction(self, new_direction):
-        if self.direction:
-            if (self.direction[0] + new_direction[0] == 0) and (self.direction[1] + new_direction[1] == 0):
-                return
-        self.direction = new_direction
-
-def load_level_from_file(symbol_file_path, id_file_path):
-    if not os.path.isfile(symbol_file_path):
-        print(f"'{symbol_file_path}' missing")
-        pygame.quit()
-        sys.exit()
-    if not os.path.isfile(id_file_path):
-        print(f"'{id_file_path}' missing")
-        pygame.quit()
-        sys.exit()
-    with open(symbol_file_path, 'r') as file:
-        symbol_data = [line.rstrip('\n') for line in file]
-    with open(id_file_path, 'r') as file:
-        id_data = [line.rstrip('\n') for line in file]
-    return symbol_data, id_data
-
-def parse_level(symbol_data, id_data):
-    walls = []
-    snake_positions = {}
-    switches = {}
-    blocks = {}
-    goal_positions = []
-
-    # Check level file for character-block mappings
-    for y, (symbol_row, id_row) in enumerate(zip(symbol_data, id_data)):
-        for x, (symbol_cell, id_cell) in enumerate(zip(symbol_row, id_row)):
-            symbol = symbol_cell
-            # deal with id_char whitespace
-            id_char = id_cell.strip()
-
-            if symbol == 'W':
-                walls.append((x, y))
-            elif symbol in ('R', 'G', 'B'):
-                snake_positions[symbol] = (x, y)
-            elif symbol == 'O':
-                goal_positions.append((x, y))
-            elif symbol.islower() or symbol.isupper():
-                col_key = symbol_col_map.get(symbol)
-                if col_key:
-                    if symbol.islower():
-                        # switch
-                        switches.setdefault(col_key, {}).setdefault(id_char, []).append((x, y))
-                    else:
-                        # ...block
-                        blocks.setdefault(col_key, {}).setdefault(id_char, []).append((x, y))
-                else:
-                    # Invalid symbol
-                    pass
-    return walls, snake_positions, switches, blocks, goal_positions
-
-def check_collision(head_x, head_y, snake, walls, blocks, snake_segments):
-    new_head = (head_x, head_y)
-    if new_head in snake.positions[1:]:
-        return 'stop'
-
-    if new_head in walls:
-        return 'stop'
-
-    snake_col = snake.colour_key
-
-    for col_key, ids in blocks.items():
-        for id_num, positions in ids.items():
-            if new_head in positions:
-                if isinstance(col_key, tuple):
-                    if snake_col in col_key:
-                        return 'stop'
-                    else:
-                        return 'stop'
-                elif col_key == snake_col:
-                    return 'stop'
-                else:
-                    return 'stop'
-
-    return 'no_collision'
-
-def darken_col(col, factor=0.4):
-    return tuple(int(c * factor) for c in col)
-
-def col_key_to_str(col_key):
-    if isinstance(col_key, tuple):
-        combination_map = {
-            ('R', 'G'): 'Y',
-            ('G', 'B'): 'C',
-            ('R', 'B'): 'M'
-        }
-        return combination_map.get(col_key, ''.join(col_key))
-    else:
-        return col_key
-
-def draw_snake_segments(snake_segments, snakes):
-    for pos, colour_tuples in snake_segments.items():
-        rect = pygame.Rect(pos[0] * GRID_SQUARE_SIZE, pos[1] * GRID_SQUARE_SIZE,
-                           GRID_SQUARE_SIZE, GRID_SQUARE_SIZE)
-        if len(colour_tuples) == 1:
-            col, col_key = colour_tuples[0]
-            # Identify if this position is head
-            head_snake = None
-
-            for snake in snakes:
-                if snake.positions[0] == pos and snake.colour_key == col_key:
-                    head_snake = snake
-                    break
-
-            if head_snake:
-                pygame.draw.rect(screen, col, rect)
-
-            else:
-                pygame.draw.rect(screen, col, rect.inflate(-4, -4))
-
-        else:
-            # Multiple snakes, same position
-            unique_col_keys = set(col_key for _, col_key in colour_tuples)
-            if len(unique_col_keys) == 2:
-                combo = tuple(sorted(unique_col_keys))
-                combined_key_str = col_key_to_str(combo)
-            elif len(unique_col_keys) > 2:
-                # If >2 overlapping character colours, combine colours
-                combined_key_str = None
-            else:
-                # one colour, multiple characters
-                combined_key_str = col_key_to_str(next(iter(unique_col_keys)))
-
-            if combined_key_str and isinstance(combined_key_str, str):
-                # Default to mixed colour-combined square
-                mixed_col = mix_cols([col for col, _ in colour_tuples])
-
-                head_found = False
-
-                for snake in snakes:
-                    if snake.positions[0] == pos:
-                        print("FOUND MIXED HEAD COLOUR!")
-                        head_found = True
-                        break
-                if head_found:
-                    pygame.draw.rect(screen, mixed_col, rect)
-                else:
-                    pygame.draw.rect(screen, mixed_col, rect.inflate(-4, -4))
-            else:
-                # Default to colour-combined square
-                mixed_col = mix_cols([col for col, _ in colour_tuples])
-                pygame.draw.rect(screen, mixed_col, rect.inflate(-4, -4))
-
-def mix_cols(cols):
-    r = min(sum(colour[0] for colour in cols), 255)
-    g = min(sum(colour[1] for colour in cols), 255)
-    b = min(sum(colour[2] for colour in cols), 255)
-    return (r, g, b)
-
-def draw_character_selection(current_snake, snake_colours, screen_width):
-    indicator_size = 23
-    padding = 0
-    num_snakes = len(snake_colours)
-    start_x = screen_width - (indicator_size + padding) * num_snakes
-
-    for i, col in enumerate(snake_colours):
-        rect = pygame.Rect(start_x + i * (indicator_size + padding), padding,
-                           indicator_size, indicator_size)
-        pygame.draw.rect(screen, col, rect)
-        if i == current_snake:
-            inner_rect = rect.inflate(-10, -10)
-            pygame.draw.rect(screen, BLACK, inner_rect)
-
-def get_next_level_filename(current_level):
-    # Generate next level's filename, given active level's filename
-    level_num = int(current_level.split('_')[-1].split('.')[0])
-    next_level = f"levels/lvl_{level_num + 1}.txt"
-    return next_level if os.path.isfile(next_level) else None
-
-def game(level_active):
-    global screen, image_assets
-    clock = pygame.time.Clock()
-
-    symbol_file_path = level_active
-    id_file_path = level_active.replace('.txt', '_map.txt')
-
-    symbol_data, id_data = load_level_from_file(symbol_file_path, id_file_path)
-
-    GRID_HEIGHT = len(symbol_data)
-    GRID_WIDTH = max(len(row) for row in symbol_data)
-    SCREEN_WIDTH = GRID_WIDTH * GRID_SQUARE_SIZE
-    SCREEN_HEIGHT = GRID_HEIGHT * GRID_SQUARE_SIZE
-
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("PRISN")
-
-    walls, snake_positions, switches, blocks, goal_positions = parse_level(symbol_data, id_data)
-
-    snakes = []
-    for colour_key, pos in snake_positions.items():
-        colour = colour_mappings[colour_key]
-        snake = Snake(colour, pos, colour_key)
-        snakes.append(snake)
-
-    current_snake = 0
-
-    # Image dict init
-    image_assets = {}
-
-    # Image - walls
-    wall_image = None
-    try:
-        wall_image = pygame.image.load('assets/wall.png').convert_alpha()
-        print("Loaded 'wall.png'")
-    except Exception as e:
-        print(f"no 'wall.png': {e}")
-    image_assets['wall'] = wall_image
-
-    # Image - win
-    goal_image = None
-    try:
-        goal_image = pygame.image.load('assets/goal.png').convert_alpha()
-        print("Loaded 'goal.png'")
-    except Exception as e:
-        print(f"no 'goal.png': {e}")
-    image_assets['goal'] = goal_image
-
-    # Image - snake
-    for snake in snakes:
-        col_key = snake.colour_key
-        image_key = f'snake_{col_key}'
-        image = None
-        try:
-            image_filename = f'assets/snake_{col_key}.png'
-            image = pygame.image.load(image_filename).convert_alpha()
-            print(f"Loaded '{image_filename}'")
-        except Exception as e:
-            print(f"no snake image '{image_filename}': {e}")
-        image_assets[image_key] = image
-
-    # Load combined snake images (e.g., snake_Y.png, snake_C.png, snake_M.png)
-    # WHY doesn't this wooooork?
-    combined_colours = [key for key in colour_mappings.keys() if isinstance(key, tuple)]
-    for combo in combined_colours:
-        combined_key_str = col_key_to_str(combo)
-        image_key = f'snake_{combined_key_str}'
-        image = None
-        try:
-            combined_image_filename = f'assets/snake_{combined_key_str}.png'
-            image = pygame.image.load(combined_image_filename).convert_alpha()
-            print(f"Loaded combined character image '{combined_image_filename}'")
-        except Exception as e:
-            print(f"no combined character image '{combined_image_filename}': {e}")
-        image_assets[image_key] = image
-
-    # Load images - blocks, switches
-    used_col_keys = set()
-
-    for col_key in blocks.keys():
-        used_col_keys.add(col_key)
-    for col_key in switches.keys():
-        used_col_keys.add(col_key)
-
-    for col_key in used_col_keys:
-        # Load block image
-        block_key = f'block_{col_key_to_str(col_key)}'
-        block_image = None
-        try:
-            col_key_str = col_key_to_str(col_key)
-            image_filename = f'assets/block_{col_key_str}.png'
-            block_image = pygame.image.load(image_filename).convert_alpha()
-            print(f"Loaded block image '{image_filename}'")
-        except Exception as e:
-            print(f"no block image '{image_filename}': {e}")
-        image_assets[f'block_{col_key}'] = block_image
-
-        # Load switch image
-        switch_key = f'switch_{col_key_to_str(col_key)}'
-        switch_image = None
-        try:
-            image_filename = f'assets/switch_{col_key_str}.png'
-            switch_image = pygame.image.load(image_filename).convert_alpha()
-            print(f"Loaded switch image '{image_filename}'")
-        except Exception as e:
-            print(f"no switch image '{image_filename}': {e}")
-        image_assets[f'switch_{col_key}'] = switch_image
-
-
-    # ////////////////// MAIN LOOP (wow look at it go!) ////////////////// #
-
-    while True:
-        screen.fill(BLACK)
-        current_time = pygame.time.get_ticks()
-
-        # Event handling
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                # Handle reset
-                if event.key == pygame.K_r:
-                    print("Level reset")
-                    game(level_active)
-                # Character select
-                if event.key == pygame.K_1 and len(snakes) >= 1:
-                    current_snake = 0
-                    print("Selected R")
-                elif event.key == pygame.K_2 and len(snakes) >= 2:
-                    current_snake = 1
-                    print("Selected G")
-                elif event.key == pygame.K_3 and len(snakes) >= 3:
-                    current_snake = 2
-                    print("Selected B")
-                # Movement keys
-                elif event.key in (pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d):
-                    if event.key == pygame.K_w:
-                        snakes[current_snake].set_direction(UP)
-                        print(f"Snake {current_snake + 1} set direction UP.")
-                    elif event.key == pygame.K_s:
-                        snakes[current_snake].set_direction(DOWN)
-                        print(f"Snake {current_snake + 1} set direction DOWN.")
-                    elif event.key == pygame.K_a:
-                        snakes[current_snake].set_direction(LEFT)
-                        print(f"Snake {current_snake + 1} set direction LEFT.")
-                    elif event.key == pygame.K_d:
-                        snakes[current_snake].set_direction(RIGHT)
-                        print(f"Snake {current_snake + 1} set direction RIGHT.")
-
-                    snake = snakes[current_snake]
-
-                    original_positions = list(snake.positions)
-                    snake.move()
-                    head_x, head_y = snake.positions[0]
-
-                    collision_type = check_collision(head_x, head_y, snake, walls, blocks, snake_segments={})
-
-                    if collision_type == 'stop':
-                        snake.positions = original_positions
-                        print(f"Snake {current_snake + 1} collided with wall or itself. Movement stopped.")
-                    elif collision_type == 'death':
-                        print("fuked it m8")
-                        pygame.quit()
-                        sys.exit()
-                    else:
-                        snake.last_move_time = current_time
-                        print(f"Snake {current_snake + 1} moved")
-
-            elif event.type == pygame.KEYUP:
-                if event.key in (pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d):
-                    snakes[current_snake].direction = None
-                    print(f"Snake {current_snake + 1} stopped")
-
-        # Movement (based on direction and MOVE_DELAY)
-        if snakes[current_snake].direction:
-            if current_time - snakes[current_snake].last_move_time >= MOVE_DELAY:
-                snake = snakes[current_snake]
-
-                original_positions = list(snake.positions)
-                snake.move()
-                head_x, head_y = snake.positions[0]
-
-                collision_type = check_collision(head_x, head_y, snake, walls, blocks, snake_segments={})
-
-                if collision_type == 'stop':
-                    snake.positions = original_positions
-                    print(f"Snake {current_snake + 1} collision -> stop")
-                elif collision_type == 'death':
-                    print("fuked it m8.")
-                    pygame.quit()
-                    sys.exit()
-                else:
-                    snake.last_move_time = current_time
-                    print(f"Snake {current_snake + 1} moved")
-
-        # Get snake head positions
-        head_positions = {}
-        for snake in snakes:
-            head_pos = snake.positions[0]
-            snake_col = snake.colour_key
-            if head_pos in head_positions:
-                head_positions[head_pos].append(snake_col)
-            else:
-                head_positions[head_pos] = [snake_col]
-
-
-        # //////// Check switch activation ////////
-
-        # Single-colour switches
-        for snake in snakes:
-            head_pos = snake.positions[0]
-            snake_col = snake.colour_key
-
-            if snake_col in switches:
-                for id_num, positions in list(switches[snake_col].items()):
-                    if head_pos in positions:
-                        # Remove matching-ID blocks
-                        if snake_col in blocks and id_num in blocks[snake_col]:
-                            del blocks[snake_col][id_num]
-                            print(f"Snake '{snake_col}' activated switch '{id_num}' -> block removed")
-                        switches[snake_col][id_num].remove(head_pos)
-                        if not switches[snake_col][id_num]:
-                            del switches[snake_col][id_num]
-                        snake.grow()
-                        print(f"Snake '{snake_col}' --> new length: {snake.length}")
-
-        # Check colour combination switches
-        for pos, cols_at_pos in head_positions.items():
-            if len(cols_at_pos) >= 2:
-                colour_keys_set = set(cols_at_pos)
-                for combo_colour in [key for key in switches.keys() if isinstance(key, tuple)]:
-                    if set(combo_colour) == colour_keys_set:
-                        for id_num, positions in list(switches[combo_colour].items()):
-                            if pos in positions:
-                                # Remove blocks with matching ID
-                                if combo_colour in blocks and id_num in blocks[combo_colour]:
-                                    del blocks[combo_colour][id_num]
-                                    print(f"Combined snakes {combo_colour} activated switch '{id_num}'. Removed block.")
-                                switches[combo_colour][id_num].remove(pos)
-                                if not switches[combo_colour][id_num]:
-                                    del switches[combo_colour][id_num]
-                                # Add to trail for all involved snakes
-                                for snake in snakes:
-                                    if snake.colour_key in combo_colour:
-                                        snake.grow()
-                                        print(f"Snake '{snake.colour_key}' --> length: {snake.length}")
-
-        # Collect snake segments *after* movement + switch activation
-        snake_segments = {}
-        for snake in snakes:
-            for pos in snake.positions:
-                if pos in snake_segments:
-                    snake_segments[pos].append((snake.col, snake.colour_key))
-                else:
-                    snake_segments[pos] = [(snake.col, snake.colour_key)]
-
-        # Check for win
-        if all(snake.positions[0] in goal_positions for snake in snakes):
-            print("$$$ CASH PRIZES YOU ARE WINNER $$$")
-            next_level = get_next_level_filename(level_active)
-            if next_level:
-                print(f"loading next level: {next_level}")
-                game(next_level)
-            else:
-                print("That'll do now get to bed.")
-                level_active = first_level
-                next_level = first_level
-                show_title_screen()
-                game(first_level)
-
-
-        # Draw walls
-        for wall in walls:
-            rect = pygame.Rect(wall[0] * GRID_SQUARE_SIZE, wall[1] * GRID_SQUARE_SIZE,
-                               GRID_SQUARE_SIZE, GRID_SQUARE_SIZE)
-            if image_assets['wall']:
-                screen.blit(image_assets['wall'], rect)
-            else:
-                pygame.draw.rect(screen, COL_WALL, rect)
-
-        # Draw blocks
-        for col_key, ids in blocks.items():
-            col_key_str = col_key_to_str(col_key)
-            image_key = f'block_{col_key}'
-            image = image_assets.get(image_key)
-            for id_num, positions in ids.items():
-                for pos in positions:
-                    rect = pygame.Rect(pos[0] * GRID_SQUARE_SIZE, pos[1] * GRID_SQUARE_SIZE,
-                                       GRID_SQUARE_SIZE, GRID_SQUARE_SIZE)
-                    if image:
-                        screen.blit(image, rect)
-                    else:
-                        col = colour_mappings.get(col_key, WHITE)
-                        darker_col = darken_col(col)
-                        pygame.draw.rect(screen, darker_col, rect)
-        
-
-        # Draw - characters with flipped + combined assets
-        draw_snake_segments(snake_segments, snakes)
-
-        # Draw - switches
-        for col_key, ids in switches.items():
-            col_key_str = col_key_to_str(col_key)
-            image_key = f'switch_{col_key}'
-            image = image_assets.get(image_key)
-            for id_num, positions in ids.items():
-                for pos in positions:
-                    rect = pygame.Rect(pos[0] * GRID_SQUARE_SIZE, pos[1] * GRID_SQUARE_SIZE,
-                                       GRID_SQUARE_SIZE, GRID_SQUARE_SIZE)
-                    if image:
-                        screen.blit(image, rect)
-                    else:
-                        col = colour_mappings.get(col_key, WHITE)
-                        # smaller rect
-                        small_rect = rect.inflate(-GRID_SQUARE_SIZE * 0.2, -GRID_SQUARE_SIZE * 0.2)
-                        pygame.draw.rect(screen, col, small_rect)
-
-        # Draw - win blocks
-        for pos in goal_positions:
-            rect = pygame.Rect(pos[0] * GRID_SQUARE_SIZE, pos[1] * GRID_SQUARE_SIZE,
-                               GRID_SQUARE_SIZE, GRID_SQUARE_SIZE)
-            if image_assets['goal']:
-                screen.blit(image_assets['goal'], rect)
-            else:
-                pygame.draw.rect(screen, WHITE, rect)
-
-        # Draw - character selection indicator
-        snake_colours = [snake.col for snake in snakes]
-        draw_character_selection(current_snake, snake_colours, SCREEN_WIDTH)
-
-        pygame.display.flip()
-        clock.tick(FPS)
-
-def show_title_screen():
-    # TITLE SCREEN
-    # TODO should have instructions and backstory and stuff
-
-    mixer.init()
-    mixer.music.load('assets/audio/music/music.ogg')
-    mixer.music.play(-1)
-    mixer.music.set_volume(0.35)
-
-    screen = pygame.display.set_mode((800, 600))
-    pygame.display.set_caption("PRISN")
-
-    # Title screen assets
-    title_image = pygame.image.load("assets/title_screen/title_screen.png").convert()
-    begin_button = pygame.image.load("assets/title_screen/begin_button.png").convert_alpha()
-
-    title_rect = title_image.get_rect(center = (400, 250))
-    button_rect = begin_button.get_rect(center = (400, 450))
-
-    while True:
-        screen.fill((0, 0, 0))
-
-        screen.blit(title_image, title_rect)
-        screen.blit(begin_button, button_rect)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if button_rect.collidepoint(event.pos):
-                    return
-        pygame.display.flip()
-        pygame.time.Clock().tick(30)
-
-
-if __name__ == "__main__":
-    show_title_screen()
-    first_level = "levels/lvl_1.txt"
-    level_active = first_level
-    game(level_active)
+import pygame
+import sys
+import os
+
+from pygame.locals import *
+
+from engine import UP, DOWN, LEFT, RIGHT, History, apply_move
+from render import Renderer
+from display import display
+from assets import sprites, load_image
+from levelpack import TextLevels, open_levels
+from replay import Recorder
+from preload import Preloader
+from inputqueue import InputQueue
+from hotreload import LevelWatcher, POLL_MS, reload_level
+from audio import audio, pre_init as audio_pre_init
+from profiler import profiler, input_latency, setup_profiler, OVERLAY_REFRESH_MS
+from log import engine_log, input_log, assets_log, setup_logging, dump_ring, INFO
+
+# SETTINGS #
+#//////////////////////////////////////////////////////////////////////////////
+GRID_SQUARE_SIZE = 20
+FPS = 60
+MOVE_DELAY = 100
+# Longest the loop sleeps with nothing going on (nothing needs it to wake up, it's
+# just a heartbeat)
+IDLE_WAIT = 1000
+# PRISN_RECORD=some/dir saves a replay of every level played there (see replay.py)
+RECORD_DIR = os.environ.get('PRISN_RECORD')
+# PRISN_HOTRELOAD=1 picks up edits to the level being played (see hotreload.py)
+HOT_RELOAD = os.environ.get('PRISN_HOTRELOAD', '') not in ('', '0')
+#//////////////////////////////////////////////////////////////////////////////
+
+# Small mixer buffer, has to be asked for before pygame.init() opens the mixer
+audio_pre_init()
+pygame.init()
+
+# Quiet unless PRISN_LOG says otherwise, see log.py
+setup_logging()
+# Sound effects decoded once, up front, see audio.py
+audio.init()
+# Off unless PRISN_PROFILE is set (or F3 in game), see profiler.py
+setup_profiler()
+
+# Compiled levels/levels.pack when there's an up to date one, else the lvl_N.txt files.
+# Hot reload always reads the text files, they're what's being edited
+levels = TextLevels() if HOT_RELOAD else open_levels()
+# Next level + sprite images get decoded on a background thread, see preload.py.
+# The sprites can start right away, the title screen doesn't use them. Not with hot
+# reload, a level decoded ahead of time could be out of date by the time it's played
+preloader = Preloader(levels, background=not HOT_RELOAD)
+preloader.request_sprites()
+
+def load_level(name):
+    try:
+        return preloader.take_level(name)
+    except KeyError:
+        assets_log.error("level '%s' missing", name)
+    except FileNotFoundError as e:
+        assets_log.error("'%s' missing", e.filename)
+    pygame.quit()
+    sys.exit()
+
+DIRECTION_NAMES = {UP: 'UP', DOWN: 'DOWN', LEFT: 'LEFT', RIGHT: 'RIGHT'}
+
+def report_events(events, snakes):
+    # Called for every move, bail before touching the events when nobody's listening
+    if not engine_log.isEnabledFor(INFO):
+        return
+    for event in events:
+        kind = event[0]
+        if kind == 'stop':
+            engine_log.debug("Snake %d collision -> stop", event[1] + 1)
+        elif kind == 'move':
+            engine_log.debug("Snake %d moved", event[1] + 1)
+        elif kind == 'blocks':
+            if isinstance(event[1], tuple):
+                engine_log.info("Combined snakes %s activated switch '%s'. Removed block.", event[1], event[2])
+            else:
+                engine_log.info("Snake '%s' activated switch '%s' -> block removed", event[1], event[2])
+        elif kind == 'grow':
+            snake = snakes[event[1]]
+            engine_log.info("Snake '%s' --> new length: %d", snake.colour_key, event[2])
+
+# ////////////////// SCENES ////////////////// #
+# Title -> level -> transition -> level ... -> title. Only one scene is alive at a
+# time: run() swaps them in a flat loop and calls exit() on the old one so its
+# state, renderer and surfaces can be freed (no more game() calling game()).
+
+class Scene:
+    fps = FPS
+
+    def __init__(self):
+        self.next_scene = None
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, current_time):
+        pass
+
+    def next_update(self, current_time):
+        # -> ms until update() has something to do again, None if only input can change
+        # anything (the loop then sleeps until an event comes in)
+        return 0
+
+    def draw(self):
+        # -> rects to push to the display
+        return []
+
+    def invalidate(self, rect):
+        # Something was drawn over rect (profiler overlay), redraw it next frame
+        pass
+
+
+class TitleScene(Scene):
+    # TODO should have instructions and backstory and stuff
+    fps = 30
+
+    def __init__(self, first_level):
+        super().__init__()
+        self.first_level = first_level
+
+    def enter(self):
+        # Keeps going if it's already playing
+        audio.play_music()
+
+        # Coming back from the last level -> same window
+        self.screen = display.open()
+        self.preload_requested = False
+
+        # Title screen assets
+        self.title_image = load_image("assets/title_screen/title_screen.png", alpha=False)
+        self.begin_button = load_image("assets/title_screen/begin_button.png")
+
+        self.title_rect = self.title_image.get_rect(center = (400, 250))
+        self.button_rect = self.begin_button.get_rect(center = (400, 450))
+
+    def exit(self):
+        # The images themselves stay in the load_image() cache
+        self.screen = self.title_image = self.begin_button = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.button_rect.collidepoint(display.to_logical(event.pos)):
+                self.next_scene = LevelScene(self.first_level, self.first_level)
+
+    def update(self, current_time):
+        # Get the first level going in the background (not in enter(), the worker would
+        # be competing with this scene's first frame)
+        if not self.preload_requested:
+            preloader.request_level(self.first_level)
+            self.preload_requested = True
+
+    def next_update(self, current_time):
+        # Static screen, the music plays on the mixer's own thread
+        return None
+
+    def draw(self):
+        self.screen.fill((0, 0, 0))
+        self.screen.blit(self.title_image, self.title_rect)
+        self.screen.blit(self.begin_button, self.button_rect)
+        return [self.screen.get_rect()]
+
+
+class LevelScene(Scene):
+    def __init__(self, level_active, first_level, recorder=None, inputs=None):
+        super().__init__()
+        self.level_active = level_active
+        self.first_level = first_level
+        # A reset carries on with the same recording, and the keys pressed after it
+        self.recorder = recorder
+        self.inputs = inputs
+
+    def enter(self):
+        self.state = load_level(self.level_active)
+        self.snakes = self.state.snakes
+        self.current_snake = 0
+        if self.inputs is None:
+            self.inputs = InputQueue(len(self.snakes))
+        # Z / Y, every successful move since the level started
+        self.history = History(self.state.width)
+
+        # Same view size whatever the level, the renderer's camera does the rest
+        screen = display.open()
+
+        # Sprites are shared by every level, decoded on the preload thread while the title
+        # was up and only converted + packed here, the first time
+        if not sprites.loaded:
+            sprites.load(images=preloader.take_sprites())
+        self.preload_requested = False
+
+        self.renderer = Renderer(screen, self.state, GRID_SQUARE_SIZE)
+        self.watcher = LevelWatcher(levels.level_dir, self.level_active) if HOT_RELOAD else None
+
+        if self.recorder is None and RECORD_DIR:
+            self.recorder = Recorder(self.level_active, RECORD_DIR, pygame.time.get_ticks())
+
+    def exit(self):
+        # Level won / quit -> the recording ends here
+        if self.recorder:
+            input_log.info("recording saved to %s", self.recorder.save(self.state))
+            self.recorder = None
+        self.state = self.snakes = self.renderer = self.history = self.inputs = self.watcher = None
+
+    def record(self, action):
+        if self.recorder:
+            self.recorder.record(action, pygame.time.get_ticks())
+
+    def handle_event(self, event):
+        # Keys only get queued here, in order, and are applied on the next update()
+        if event.type == pygame.KEYDOWN:
+            self.inputs.key_down(event.key)
+        elif event.type == pygame.KEYUP:
+            self.inputs.key_up(event.key)
+
+    def apply_inputs(self, current_time):
+        inputs = self.inputs
+        while inputs and not self.state.won:
+            input_ns, kind, snake_index, direction = inputs.pop()
+            if kind == 'move':
+                snake = self.snakes[snake_index]
+                snake.set_direction(direction)
+                input_log.debug("Snake %d set direction %s.", snake_index + 1, DIRECTION_NAMES[direction])
+                # A key press moves straight away and restarts the move ticks from here
+                snake.last_move_time = current_time
+                self.move()
+                input_latency.applied(input_ns)
+            elif kind == 'stop':
+                # Only if it's still going that way, another key may have taken over
+                if self.snakes[snake_index].direction == direction:
+                    self.snakes[snake_index].direction = None
+                    input_log.debug("Snake %d stopped", snake_index + 1)
+            elif kind == 'select':
+                self.current_snake = snake_index
+                input_log.debug("Selected %s", 'RGB'[snake_index])
+                self.record(str(snake_index + 1))
+            elif kind == 'undo':
+                # Undo / redo, straight away and without touching the level files
+                self.record('z')
+                self.undo()
+            elif kind == 'redo':
+                self.record('y')
+                self.redo()
+            elif kind == 'reset':
+                # Whatever was queued after R goes to the fresh level
+                input_log.info("Level reset")
+                self.record('r')
+                self.next_scene = LevelScene(self.level_active, self.first_level, self.recorder, inputs)
+                self.recorder = None
+                return
+
+    def move(self):
+        snake = self.snakes[self.current_snake]
+        self.record(snake.direction)
+        events = apply_move(self.state, self.current_snake, snake.direction)
+        self.history.record(self.current_snake, events)
+        report_events(events, self.snakes)
+        self.renderer.handle_events(events)
+        audio.handle_events(events)
+
+    def undo(self):
+        undone = self.history.undo(self.state)
+        if undone:
+            input_log.debug("Undo, %d moves left to undo", len(self.history))
+            self.renderer.handle_events(undone)
+
+    def redo(self):
+        events = self.history.redo(self.state)
+        if events:
+            input_log.debug("Redo")
+            report_events(events, self.snakes)
+            self.renderer.handle_events(events)
+            audio.handle_events(events)
+
+    def hot_reload(self):
+        old = self.watcher.poll()
+        if old is None:
+            return
+        try:
+            result, changed, moved = reload_level(self.state, self.watcher, old)
+        except ValueError as e:
+            assets_log.error("couldn't reload '%s': %s", self.level_active, e)
+            return
+        if result == 'rebuilt':
+            self.state = changed
+            self.snakes = self.state.snakes
+            self.current_snake = min(self.current_snake, len(self.snakes) - 1)
+            self.renderer = Renderer(self.renderer.screen, self.state, GRID_SQUARE_SIZE)
+        else:
+            self.renderer.refresh_cells(changed)
+            if moved:
+                self.renderer.sync(self.snakes)
+        self.inputs.set_snake_count(len(self.snakes), self.current_snake)
+        # The moves so far were made on the old level, they can't be undone or replayed
+        self.history = History(self.state.width)
+        if self.recorder:
+            input_log.warning("level changed, recording of '%s' dropped", self.level_active)
+            self.recorder = None
+
+    def update(self, current_time):
+        # Start on the next level while this one's being played, once it's up and running
+        if not self.preload_requested:
+            preloader.request_level(levels.next_level(self.level_active))
+            self.preload_requested = True
+
+        if self.watcher and current_time >= self.watcher.next_poll:
+            self.watcher.next_poll = current_time + POLL_MS
+            self.hot_reload()
+
+        self.apply_inputs(current_time)
+        if self.next_scene:
+            return
+
+        # Held key: one move per MOVE_DELAY tick, counted from the key press rather than
+        # from whenever the loop got round to it. After a stall (window dragged, debugger)
+        # the ticks start over instead of replaying every missed move at once
+        snake = self.snakes[self.current_snake]
+        if snake.direction and current_time - snake.last_move_time >= MOVE_DELAY:
+            if current_time - snake.last_move_time >= 2 * MOVE_DELAY:
+                snake.last_move_time = current_time
+            else:
+                snake.last_move_time += MOVE_DELAY
+            self.move()
+
+        # Check for win
+        if self.state.won:
+            self.next_scene = TransitionScene(self.level_active, self.first_level)
+
+    def next_update(self, current_time):
+        # Only a held key moves anything without input (or keys still queued after a reset)
+        if self.inputs:
+            return 0
+        timeout = None
+        snake = self.snakes[self.current_snake]
+        if snake.direction:
+            timeout = max(0, snake.last_move_time + MOVE_DELAY - current_time)
+        # ...and the level files' next check with hot reload on
+        if self.watcher:
+            poll = max(0, self.watcher.next_poll - current_time)
+            timeout = poll if timeout is None else min(timeout, poll)
+        return timeout
+
+    def draw(self):
+        # Only the cells that changed get redrawn + pushed to the display
+        return self.renderer.draw(self.snakes, self.current_snake)
+
+    def invalidate(self, rect):
+        self.renderer.invalidate(rect)
+
+
+class TransitionScene(Scene):
+    # Between a won level and whatever comes next
+    def __init__(self, level_won, first_level):
+        super().__init__()
+        self.level_won = level_won
+        self.first_level = first_level
+
+    def enter(self):
+        engine_log.info("$$$ CASH PRIZES YOU ARE WINNER $$$")
+        next_level = levels.next_level(self.level_won)
+        if next_level:
+            engine_log.info("loading next level: %s", next_level)
+            self.next_scene = LevelScene(next_level, self.first_level)
+        else:
+            engine_log.info("That'll do now get to bed.")
+            self.next_scene = TitleScene(self.first_level)
+
+
+def switch_scenes(scene):
+    # Follow next_scene until one wants to stay (a transition passes straight through)
+    while scene.next_scene is not None:
+        next_scene = scene.next_scene
+        scene.exit()
+        scene = next_scene
+        scene.enter()
+    return scene
+
+
+def wait_for_events(timeout):
+    # -> pending events, blocking for up to timeout ms (None: IDLE_WAIT) if there are none
+    events = pygame.event.get()
+    if events or timeout == 0:
+        return events
+    event = pygame.event.wait(IDLE_WAIT if timeout is None else min(timeout, IDLE_WAIT))
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+
+def run(first_level, title=True):
+    clock = pygame.time.Clock()
+    scene = TitleScene(first_level) if title else LevelScene(first_level, first_level)
+    scene.enter()
+    # Nothing uses the mouse position, don't wake up for it
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+
+    # ////////////////// MAIN LOOP (wow look at it go!) ////////////////// #
+
+    # Sleeps in wait_for_events() until there's input or the scene has something to
+    # do (a held key's next move tick), so a static screen costs next to no CPU.
+    # Moving snakes step on their MOVE_DELAY ticks, drawing only happens when
+    # something changed and is capped at the scene's fps.
+    timeout = 0
+    while True:
+        events = wait_for_events(timeout)
+        profiler.lap('wait')
+        for event in events:
+            if event.type == pygame.QUIT:
+                scene.exit()
+                preloader.shutdown()
+                profiler.dump()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+            elif event.type == pygame.VIDEORESIZE:
+                # Same frame, presented again at the new size
+                display.resized()
+            scene.handle_event(event)
+            # e.g. keys pressed right after R go to the fresh level
+            scene = switch_scenes(scene)
+        profiler.lap('events')
+
+        scene.update(pygame.time.get_ticks())
+        scene = switch_scenes(scene)
+        profiler.lap('update')
+
+        # The overlay sits on top of the scene, so whatever it covered gets redrawn first
+        if profiler.overlay_rect:
+            scene.invalidate(profiler.overlay_rect)
+            profiler.overlay_rect = None
+        dirty_rects = scene.draw()
+        profiler.lap('draw')
+        if profiler.show_overlay:
+            dirty_rects.append(profiler.draw_overlay(display.surface, pygame.time.get_ticks()))
+            profiler.lap('overlay')
+
+        display.present(dirty_rects)
+        input_latency.presented()
+        profiler.lap('present')
+        clock.tick(scene.fps)
+        profiler.lap('tick')
+        profiler.end_frame()
+
+        timeout = scene.next_update(pygame.time.get_ticks())
+        if profiler.show_overlay:
+            # Keep the overlay's numbers ticking over
+            timeout = OVERLAY_REFRESH_MS if timeout is None else min(timeout, OVERLAY_REFRESH_MS)
+
+
+if __name__ == "__main__":
+    try:
+        run("lvl_1")
+    except Exception:
+        # Post-mortem: whatever the ring buffer (PRISN_LOG_RING) caught before the crash
+        crash_log = dump_ring()
+        if crash_log:
+            print(f"last log records written to {crash_log}", file=sys.stderr)
+        raise
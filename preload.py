@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import ASSET_DIR, decode_sprites
+
+# Background loading. One worker thread decodes what the game is going to want next
+# (the next level's state as soon as a level starts, the sprite images while the
+# title screen is up) and the main thread picks the results up with take_*().
+# Nothing here touches the display: convert_alpha() and friends stay on the main
+# thread, in SpriteAtlas.load().
+#
+# A take_*() for something that was never requested (or got dropped) just does the
+# work right there, same as before there was a preloader. Errors raised in the worker
+# come out of take_*() too.
+
+
+class Preloader:
+    def __init__(self, levels, background=True):
+        self.levels = levels
+        # background=False: requests are ignored and everything loads on take (for timing the difference)
+        self.background = background
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preload') if background else None
+        self.pending = {}       # ('level', name) / ('sprites', asset_dir) -> Future
+
+    def request(self, key, func, *args):
+        if self.executor is not None and key not in self.pending:
+            self.pending[key] = self.executor.submit(func, *args)
+
+    def take(self, key, func, *args):
+        future = self.pending.pop(key, None)
+        if future is None:
+            return func(*args)
+        # Still going -> wait for it, it's had a head start anyway
+        return future.result()
+
+    def request_level(self, name):
+        if name is not None:
+            self.request(('level', name), self.levels.load, name)
+
+    def take_level(self, name):
+        # -> fresh GameState, raises like levels.load()
+        return self.take(('level', name), self.levels.load, name)
+
+    def request_sprites(self, asset_dir=ASSET_DIR):
+        self.request(('sprites', asset_dir), decode_sprites, asset_dir)
+
+    def take_sprites(self, asset_dir=ASSET_DIR):
+        # -> {(kind, col_key): unconverted surface}
+        return self.take(('sprites', asset_dir), decode_sprites, asset_dir)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending = {}
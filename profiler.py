@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+# Per-phase frame timings. The main loop calls profiler.lap('phase') after each
+# part of a frame and profiler.end_frame() at the end; a lap is the time since the
+# previous lap, so the phases add up to the whole frame. Off by default, where
+# lap()/end_frame() return straight away.
+#   PRISN_PROFILE=1 python main.py          record, write profile.csv + profile.json on exit
+#   PRISN_PROFILE=out/run1 python main.py   ...to out/run1.csv + out/run1.json
+#   F3 in game                              toggle the overlay (starts recording too)
+
+WINDOW = 600            # frames kept for the rolling percentiles, ~10s at 60 FPS
+TRACE_FRAMES = 36000    # frames kept for the trace dump, ~10 minutes
+OVERLAY_REFRESH_MS = 250
+OVERLAY_POS = (4, 4)
+IDLE_PHASES = ('wait', 'tick')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summary(samples):
+    # ns samples -> {'p50', 'p95', 'p99', 'max', 'mean'} in ms
+    values = sorted(samples)
+    return {
+        'p50': percentile(values, 0.50) / 1e6,
+        'p95': percentile(values, 0.95) / 1e6,
+        'p99': percentile(values, 0.99) / 1e6,
+        'max': values[-1] / 1e6,
+        'mean': sum(values) / len(values) / 1e6,
+    }
+
+
+class FrameProfiler:
+    def __init__(self, window=WINDOW, trace_frames=TRACE_FRAMES):
+        self.enabled = False
+        self.show_overlay = False
+        self.dump_prefix = None
+        self.samples = {}       # phase -> last `window` durations in ns, 'frame' is the total
+        self.phases = []        # first-seen order, CSV columns
+        self.window = window
+        self.trace = deque(maxlen=trace_frames)
+        self.current = {}
+        self.frame_count = 0
+        self.last = 0
+        self.frame_start = 0
+
+        self.font = None
+        self.overlay_image = None
+        self.overlay_updated = 0
+        # Where the overlay was drawn last frame, the scene has to restore it
+        self.overlay_rect = None
+
+    def start(self):
+        if not self.enabled:
+            self.enabled = True
+            self.last = self.frame_start = time.perf_counter_ns()
+            self.current = {}
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self.current[phase] = self.current.get(phase, 0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        frame = self.current
+        frame['frame'] = now - self.frame_start
+        for phase, ns in frame.items():
+            samples = self.samples.get(phase)
+            if samples is None:
+                samples = self.samples[phase] = deque(maxlen=self.window)
+                if phase != 'frame':
+                    self.phases.append(phase)
+            samples.append(ns)
+        self.trace.append((self.frame_count, frame))
+        self.frame_count += 1
+        self.current = {}
+        self.last = self.frame_start = now
+
+    def stats(self):
+        # -> {phase: {'p50', 'p95', 'p99', 'max', 'mean'}} in ms over the rolling window
+        return {phase: summary(samples) for phase, samples in self.samples.items()}
+
+    def slowest_phase(self, stats):
+        # The sleeps in clock.tick() and waiting for events aren't work
+        phases = [phase for phase in self.phases if phase not in IDLE_PHASES]
+        if not phases:
+            return None
+        return max(phases, key=lambda phase: stats[phase]['p95'])
+
+    # ////////////////// Overlay ////////////////// #
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.start()
+            self.overlay_updated = 0
+
+    def draw_overlay(self, surface, now_ms):
+        # -> rect drawn
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        if self.overlay_image is None or now_ms - self.overlay_updated >= OVERLAY_REFRESH_MS:
+            self.overlay_image = self.render_overlay()
+            self.overlay_updated = now_ms
+        rect = surface.blit(self.overlay_image, OVERLAY_POS)
+        self.overlay_rect = rect
+        return rect
+
+    def render_overlay(self):
+        stats = self.stats()
+        lines = []
+        if 'frame' in stats:
+            frame = stats['frame']
+            work = [stats[phase]['p50'] for phase in self.phases if phase not in IDLE_PHASES]
+            lines.append(f"frame {frame['p50']:.1f} ms  p95 {frame['p95']:.1f}  p99 {frame['p99']:.1f}")
+            lines.append(f"work {sum(work):.2f} ms")
+            slowest = self.slowest_phase(stats)
+            if slowest:
+                lines.append(f"slowest: {slowest} {stats[slowest]['p95']:.2f} ms p95")
+            latency = input_latency.stats().get('shown')
+            if latency:
+                lines.append(f"key->screen {latency['p50']:.1f} ms  p95 {latency['p95']:.1f}")
+        else:
+            lines.append("profiling...")
+
+        images = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(image.get_width() for image in images) + 6
+        height = sum(image.get_height() for image in images) + 6
+        overlay = pygame.Surface((width, height))
+        overlay.fill((0, 0, 0))
+        y = 3
+        for image in images:
+            overlay.blit(image, (3, y))
+            y += image.get_height()
+        return overlay
+
+    # ////////////////// Dumps ////////////////// #
+
+    def dump(self, prefix=None):
+        # -> (csv path, json path), or None if there's nothing to write
+        prefix = prefix or self.dump_prefix
+        if not prefix or not self.trace:
+            return None
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        columns = ['frame'] + self.phases
+        csv_path = prefix + '.csv'
+        with open(csv_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['n'] + [f'{column}_us' for column in columns])
+            for n, frame in self.trace:
+                writer.writerow([n] + [round(frame.get(column, 0) / 1000, 1) for column in columns])
+
+        json_path = prefix + '.json'
+        with open(json_path, 'w') as file:
+            json.dump({
+                'frames': self.frame_count,
+                'window': self.window,
+                'phases': self.phases,
+                'stats_ms': self.stats(),
+                'input_latency_ms': input_latency.stats(),
+                'trace_us': [{column: round(frame.get(column, 0) / 1000, 1) for column in columns}
+                             for _, frame in self.trace],
+            }, file, indent=1)
+        return csv_path, json_path
+
+
+class InputLatency:
+    # Key press -> the display update that shows its move, per move. The loop stamps
+    # each key when it reads it, applied() is called as its move happens and
+    # presented() after pygame.display.update(). Always on, it's a couple of appends
+    # per key press. Time spent in SDL's queue before the loop woke up isn't in it,
+    # pygame's events don't carry SDL's timestamps.
+    def __init__(self, window=WINDOW):
+        self.shown = deque(maxlen=window)       # ns from key to display
+        self.applied_after = deque(maxlen=window)   # ns from key to the move being made
+        self.pending = []
+        self.moves = 0
+
+    def applied(self, input_ns):
+        now = time.perf_counter_ns()
+        self.applied_after.append(now - input_ns)
+        self.pending.append(input_ns)
+
+    def presented(self):
+        if not self.pending:
+            return
+        now = time.perf_counter_ns()
+        for input_ns in self.pending:
+            self.shown.append(now - input_ns)
+        self.moves += len(self.pending)
+        self.pending = []
+
+    def stats(self):
+        # -> {'moves', 'shown': {'p50', 'p95', 'p99', 'max', 'mean'}, 'applied': {...}} in ms
+        result = {'moves': self.moves}
+        for name, samples in (('shown', self.shown), ('applied', self.applied_after)):
+            if samples:
+                result[name] = summary(samples)
+        return result
+
+    def reset(self):
+        self.__init__(self.shown.maxlen)
+
+
+profiler = FrameProfiler()
+input_latency = InputLatency()
+
+
+def setup_profiler():
+    # PRISN_PROFILE=1 -> profile.csv/.json, anything else is used as the path prefix
+    setting = os.environ.get('PRISN_PROFILE', '')
+    if setting and setting != '0':
+        profiler.dump_prefix = 'profile' if setting == '1' else setting
+        profiler.start()
@@ -0,0 +1,435 @@
+from collections import OrderedDict
+
+import pygame
+
+from assets import sprites
+from engine import (WHITE, BLACK, COL_WALL, CELL_WALL, CELL_GOAL, CELL_BLOCK, CELL_SWITCH,
+                    colour_mappings, decode_cell)
+from log import render_log
+from profiler import profiler
+
+# Level drawing through a fixed-size view with a camera on the selected snake. Walls +
+# blocks are pre-composited into chunked background surfaces and switches + goals into
+# transparent overlays, so a frame only has to restore the cells the last moves
+# touched and push those with display.update(). When the camera scrolls, the chunks
+# in view get composited again - the cost depends on the window, not the map.
+
+VIEW_SIZE = (800, 600)  # window size in px, same as the title screen
+CHUNK_CELLS = 16        # chunk edge in cells
+CHUNK_CACHE = 64        # chunks kept around (at least twice what fits in the view)
+TILE_CACHE = 256        # snake cell tiles kept around, see snake_tile()
+
+
+def darken_col(col, factor=0.4):
+    return tuple(int(c * factor) for c in col)
+
+def mix_cols(cols):
+    r = min(sum(colour[0] for colour in cols), 255)
+    g = min(sum(colour[1] for colour in cols), 255)
+    b = min(sum(colour[2] for colour in cols), 255)
+    return (r, g, b)
+
+# Block colours when there's no sprite, worked out once
+dark_colours = {col_key: darken_col(col) for col_key, col in colour_mappings.items()}
+DARK_WHITE = darken_col(WHITE)
+
+def draw_snake_segment(surface, rect, colour_tuples, is_head):
+    if len(colour_tuples) == 1:
+        col, _ = colour_tuples[0]
+        if is_head:
+            pygame.draw.rect(surface, col, rect)
+        else:
+            pygame.draw.rect(surface, col, rect.inflate(-4, -4))
+
+    else:
+        # Multiple snakes, same position. Up to two colours (or one colour, several
+        # snakes) the head is a full square, more than that and it's drawn like the body
+        unique_col_keys = set(col_key for _, col_key in colour_tuples)
+
+        # Default to mixed colour-combined square
+        mixed_col = mix_cols([col for col, _ in colour_tuples])
+        if len(unique_col_keys) <= 2 and is_head:
+            render_log.debug("FOUND MIXED HEAD COLOUR!")
+            pygame.draw.rect(surface, mixed_col, rect)
+        else:
+            pygame.draw.rect(surface, mixed_col, rect.inflate(-4, -4))
+
+# Snake cells as ready-made tiles: (colour tuples, head?, cell size) -> (surface, offset
+# in the cell), drawn by draw_snake_segment() the first time they're needed. Shared by
+# every Renderer, least recently used ones get dropped past TILE_CACHE
+tile_cache = OrderedDict()
+
+def snake_tile(colour_tuples, is_head, cell_size):
+    key = (colour_tuples, is_head, cell_size)
+    tile = tile_cache.get(key)
+    if tile is not None:
+        tile_cache.move_to_end(key)
+        return tile
+    cell = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    cell.fill((0, 0, 0, 0))
+    draw_snake_segment(cell, cell.get_rect(), colour_tuples, is_head)
+    # Only the part that got drawn, and opaque, so a cell is one plain blit
+    area = cell.get_bounding_rect()
+    image = pygame.Surface(area.size).convert()
+    image.blit(cell, (0, 0), area)
+    tile = tile_cache[key] = (image, area.topleft)
+    if len(tile_cache) > TILE_CACHE:
+        tile_cache.popitem(last=False)
+    return tile
+
+def draw_character_selection(surface, current_snake, snake_colours, screen_width):
+    indicator_size = 23
+    padding = 0
+    num_snakes = len(snake_colours)
+    start_x = screen_width - (indicator_size + padding) * num_snakes
+
+    for i, col in enumerate(snake_colours):
+        rect = pygame.Rect(start_x + i * (indicator_size + padding), padding,
+                           indicator_size, indicator_size)
+        pygame.draw.rect(surface, col, rect)
+        if i == current_snake:
+            inner_rect = rect.inflate(-10, -10)
+            pygame.draw.rect(surface, BLACK, inner_rect)
+    return pygame.Rect(start_x, padding, (indicator_size + padding) * num_snakes, indicator_size)
+
+
+class Renderer:
+    def __init__(self, screen, state, cell_size):
+        self.screen = screen
+        self.state = state
+        self.cell_size = cell_size
+        self.view = screen.get_rect()
+        self.map_size = (state.width * cell_size, state.height * cell_size)
+
+        # Walls + blocks (under the snakes) and switches + goals (over them) are drawn
+        # into per-chunk surfaces the first time a chunk comes into view, so a frame
+        # only touches the chunks the camera can see, however big the map is
+        self.chunk_px = CHUNK_CELLS * cell_size
+        columns = self.view.width // self.chunk_px + 2
+        rows = self.view.height // self.chunk_px + 2
+        self.chunk_limit = max(CHUNK_CACHE, 2 * columns * rows)
+        self.chunks = OrderedDict()
+
+        # Map pixel at the view's top-left, follows the selected snake's head
+        self.camera = self.clamp_camera(0, 0)
+        self.followed = None
+
+        # Snake cells are tracked from the move events rather than rebuilt every frame:
+        # pos -> bitmask of the snakes covering it, plus every snake's head
+        self.cell_masks = {}
+        self.heads = []
+        # (mask, head?) -> tile, so a snake cell is a couple of dict lookups + a blit
+        self.tiles = {}
+        self.dirty_cells = set()
+        self.drawn_selection = None
+        self.selection_rect = None
+        self.needs_full_redraw = True
+        self.sync(state.snakes)
+
+    def cell_rect(self, pos):
+        # On screen
+        return pygame.Rect(pos[0] * self.cell_size - self.camera[0], pos[1] * self.cell_size - self.camera[1],
+                           self.cell_size, self.cell_size)
+
+    def chunk_rect(self, pos):
+        # Inside the cell's chunk surfaces
+        return pygame.Rect(pos[0] % CHUNK_CELLS * self.cell_size, pos[1] % CHUNK_CELLS * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def chunk(self, key):
+        # -> (background, overlay) of chunk (cx, cy), least recently used ones get dropped
+        layers = self.chunks.get(key)
+        if layers is not None:
+            self.chunks.move_to_end(key)
+            return layers
+
+        size = (self.chunk_px, self.chunk_px)
+        background = pygame.Surface(size).convert()
+        background.fill(BLACK)
+        overlay = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        overlay.fill((0, 0, 0, 0))
+        # Straight from the grid, so pressed switches and opened blocks are already gone
+        state = self.state
+        grid = state.grid
+        left, top = key[0] * CHUNK_CELLS, key[1] * CHUNK_CELLS
+        for y in range(top, min(top + CHUNK_CELLS, state.height)):
+            row = y * state.width
+            for x in range(left, min(left + CHUNK_CELLS, state.width)):
+                code = grid[row + x]
+                if not code:
+                    continue
+                kind, col_key, _ = decode_cell(code)
+                rect = self.chunk_rect((x, y))
+                if kind == CELL_WALL:
+                    self.draw_wall(background, rect)
+                elif kind == CELL_BLOCK:
+                    self.draw_block(background, col_key, rect)
+                elif kind == CELL_SWITCH:
+                    self.draw_switch(overlay, col_key, rect)
+                elif kind == CELL_GOAL:
+                    self.draw_goal(overlay, rect)
+
+        layers = self.chunks[key] = (background, overlay)
+        if len(self.chunks) > self.chunk_limit:
+            self.chunks.popitem(last=False)
+        return layers
+
+    def draw_wall(self, surface, rect):
+        image = sprites.get('wall')
+        if image:
+            surface.blit(image, rect)
+        else:
+            pygame.draw.rect(surface, COL_WALL, rect)
+
+    def draw_block(self, surface, col_key, rect):
+        image = sprites.get('block', col_key)
+        if image:
+            surface.blit(image, rect)
+        else:
+            pygame.draw.rect(surface, dark_colours.get(col_key, DARK_WHITE), rect)
+
+    def draw_switch(self, surface, col_key, rect):
+        image = sprites.get('switch', col_key)
+        if image:
+            surface.blit(image, rect)
+        else:
+            col = colour_mappings.get(col_key, WHITE)
+            # smaller rect
+            small_rect = rect.inflate(-self.cell_size * 0.2, -self.cell_size * 0.2)
+            pygame.draw.rect(surface, col, small_rect)
+
+    def draw_goal(self, surface, rect):
+        image = sprites.get('goal')
+        if image:
+            surface.blit(image, rect)
+        else:
+            pygame.draw.rect(surface, WHITE, rect)
+
+    def clamp_camera(self, x, y):
+        # A map smaller than the view gets centred, a bigger one never scrolls past its edges
+        camera = []
+        for pos, map_size, view_size in ((x, self.map_size[0], self.view.width),
+                                         (y, self.map_size[1], self.view.height)):
+            if map_size <= view_size:
+                camera.append((map_size - view_size) // 2)
+            else:
+                camera.append(max(0, min(pos, map_size - view_size)))
+        return tuple(camera)
+
+    def follow(self, pos, jump):
+        # Scroll when the head gets into the outer quarter of the view, centre on a newly
+        # selected snake. A camera move means redrawing the whole view
+        size = self.cell_size
+        left, top = pos[0] * size, pos[1] * size
+        x, y = self.camera
+        width, height = self.view.size
+        if jump:
+            x = left + size // 2 - width // 2
+            y = top + size // 2 - height // 2
+        else:
+            margin_x, margin_y = width // 4, height // 4
+            x = min(max(x, left + size + margin_x - width), left - margin_x)
+            y = min(max(y, top + size + margin_y - height), top - margin_y)
+        camera = self.clamp_camera(x, y)
+        if camera != self.camera:
+            self.camera = camera
+            self.needs_full_redraw = True
+
+    def visible_cells(self):
+        # -> (left, top, right, bottom) cell range on screen, right/bottom exclusive
+        size = self.cell_size
+        x, y = self.camera
+        return (max(0, x // size), max(0, y // size),
+                min(self.state.width, (x + self.view.width - 1) // size + 1),
+                min(self.state.height, (y + self.view.height - 1) // size + 1))
+
+    def sync(self, snakes):
+        # Rebuild the snake cells from scratch (new level, or the snakes changed behind our back)
+        self.cell_masks = {}
+        for i, snake in enumerate(snakes):
+            for pos in snake.positions:
+                self.cell_masks[pos] = self.cell_masks.get(pos, 0) | 1 << i
+        self.heads = [snake.positions[0] for snake in snakes]
+        self.needs_full_redraw = True
+
+    def handle_events(self, events):
+        # Move the snake cells along and patch the cached chunks for whatever a move removed
+        for event in events:
+            if event[0] == 'move':
+                _, i, pos, tail = event
+                bit = 1 << i
+                # Tail first, the head can move into the cell the tail just left
+                if tail is not None:
+                    mask = self.cell_masks[tail] & ~bit
+                    if mask:
+                        self.cell_masks[tail] = mask
+                    else:
+                        del self.cell_masks[tail]
+                    self.dirty_cells.add(tail)
+                self.cell_masks[pos] = self.cell_masks.get(pos, 0) | bit
+                # The old head gets drawn as body now
+                self.dirty_cells.add(self.heads[i])
+                self.dirty_cells.add(pos)
+                self.heads[i] = pos
+            elif event[0] == 'blocks':
+                for pos in event[3]:
+                    layers = self.chunks.get((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS))
+                    if layers:
+                        layers[0].fill(BLACK, self.chunk_rect(pos))
+                    self.dirty_cells.add(pos)
+            elif event[0] == 'switch':
+                pos = event[3]
+                layers = self.chunks.get((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS))
+                if layers:
+                    layers[1].fill((0, 0, 0, 0), self.chunk_rect(pos))
+                self.dirty_cells.add(pos)
+            # Undo (engine.undo_move) puts things back
+            elif event[0] == 'unmove':
+                _, i, pos, tail, head = event
+                bit = 1 << i
+                mask = self.cell_masks[pos] & ~bit
+                if mask:
+                    self.cell_masks[pos] = mask
+                else:
+                    del self.cell_masks[pos]
+                if tail is not None:
+                    self.cell_masks[tail] = self.cell_masks.get(tail, 0) | bit
+                    self.dirty_cells.add(tail)
+                self.dirty_cells.add(pos)
+                self.dirty_cells.add(head)
+                self.heads[i] = head
+            elif event[0] == 'unblocks':
+                for pos in event[3]:
+                    layers = self.chunks.get((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS))
+                    if layers:
+                        self.draw_block(layers[0], event[1], self.chunk_rect(pos))
+                    self.dirty_cells.add(pos)
+            elif event[0] == 'unswitch':
+                pos = event[3]
+                layers = self.chunks.get((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS))
+                if layers:
+                    self.draw_switch(layers[1], event[1], self.chunk_rect(pos))
+                self.dirty_cells.add(pos)
+
+    def refresh_cells(self, positions):
+        # The level itself changed under these cells (hot reload): their chunks get built
+        # again from the grid, the cells redrawn
+        for pos in positions:
+            self.chunks.pop((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS), None)
+            self.dirty_cells.add(pos)
+
+    def tile(self, pos, snakes):
+        # -> (surface, offset) for a snake cell. Heads get the full square (a snake's head
+        # is always one of its own cells, so the head list says it all)
+        mask = self.cell_masks[pos]
+        is_head = pos in self.heads
+        tile = self.tiles.get((mask, is_head))
+        if tile is None:
+            colour_tuples = tuple((snake.col, snake.colour_key) for i, snake in enumerate(snakes) if mask & 1 << i)
+            tile = self.tiles[(mask, is_head)] = snake_tile(colour_tuples, is_head, self.cell_size)
+        return tile
+
+    def draw_cell(self, pos, snakes):
+        rect = self.cell_rect(pos)
+        background, overlay = self.chunk((pos[0] // CHUNK_CELLS, pos[1] // CHUNK_CELLS))
+        area = self.chunk_rect(pos)
+        self.screen.blit(background, rect, area)
+        if pos in self.cell_masks:
+            image, offset = self.tile(pos, snakes)
+            self.screen.blit(image, (rect.x + offset[0], rect.y + offset[1]))
+        self.screen.blit(overlay, rect, area)
+        return rect
+
+    def draw_view(self, snakes):
+        # Visible chunks, then the snake cells in view, then the chunks' overlays
+        left, top, right, bottom = self.visible_cells()
+        keys = [(cx, cy) for cy in range(top // CHUNK_CELLS, (bottom - 1) // CHUNK_CELLS + 1)
+                for cx in range(left // CHUNK_CELLS, (right - 1) // CHUNK_CELLS + 1)]
+        layers = [(self.chunk(key), (key[0] * self.chunk_px - self.camera[0],
+                                     key[1] * self.chunk_px - self.camera[1])) for key in keys]
+
+        self.screen.fill(BLACK)
+        for (background, _), offset in layers:
+            self.screen.blit(background, offset)
+        # Whichever is smaller: the snakes, or the cells on screen
+        cell_masks = self.cell_masks
+        if len(cell_masks) <= (right - left) * (bottom - top):
+            cells = [pos for pos in cell_masks if left <= pos[0] < right and top <= pos[1] < bottom]
+        else:
+            cells = [(x, y) for y in range(top, bottom) for x in range(left, right) if (x, y) in cell_masks]
+        # Straight from the tile dict for cells seen before, it's every snake cell in view
+        size = self.cell_size
+        x, y = self.camera
+        tiles = self.tiles
+        heads = self.heads
+        blits = []
+        for pos in cells:
+            tile = tiles.get((cell_masks[pos], pos in heads)) or self.tile(pos, snakes)
+            offset = tile[1]
+            blits.append((tile[0], (pos[0] * size - x + offset[0], pos[1] * size - y + offset[1])))
+        self.screen.blits(blits, doreturn=False)
+        for (_, overlay), offset in layers:
+            self.screen.blit(overlay, offset)
+
+    def draw(self, snakes, current_snake):
+        # -> rects that changed on screen this frame (nothing moved -> nothing to do)
+        self.follow(self.heads[current_snake], current_snake != self.followed)
+        self.followed = current_snake
+
+        if self.needs_full_redraw:
+            self.draw_view(snakes)
+            profiler.lap('cells')
+            self.draw_selection(snakes, current_snake)
+            profiler.lap('selection')
+            self.dirty_cells.clear()
+            self.needs_full_redraw = False
+            return [self.view]
+
+        dirty = self.dirty_cells
+        selection_changed = current_snake != self.drawn_selection
+        if selection_changed:
+            dirty.update(self.cells_under(self.selection_rect))
+        elif not dirty:
+            return []
+
+        # Cells that moved off screen don't need drawing
+        left, top, right, bottom = self.visible_cells()
+        rects = [self.draw_cell(pos, snakes) for pos in dirty
+                 if left <= pos[0] < right and top <= pos[1] < bottom]
+        profiler.lap('cells')
+
+        # The selection indicator sits on top of the view's top-right cells
+        if selection_changed or any(rect.colliderect(self.selection_rect) for rect in rects):
+            rects.append(self.draw_selection(snakes, current_snake))
+        profiler.lap('selection')
+
+        self.dirty_cells = set()
+        return rects
+
+    def draw_selection(self, snakes, current_snake):
+        snake_colours = [snake.col for snake in snakes]
+        self.selection_rect = draw_character_selection(self.screen, current_snake, snake_colours,
+                                                       self.screen.get_width())
+        self.drawn_selection = current_snake
+        return self.selection_rect
+
+    def invalidate(self, rect):
+        # Something else drew over this part of the screen, restore it next frame
+        rect = rect.clip(self.view)
+        if not (rect.width and rect.height):
+            return
+        # Off the map (margins around a small map) there are no cells to redraw
+        map_rect = pygame.Rect(-self.camera[0], -self.camera[1], *self.map_size)
+        if map_rect.contains(rect):
+            self.dirty_cells.update(self.cells_under(rect))
+        else:
+            self.needs_full_redraw = True
+
+    def cells_under(self, rect):
+        # Screen rect -> map cells, clipped to the map
+        size = self.cell_size
+        x, y = self.camera
+        return [(cx, cy) for cx in range(max(0, (rect.left + x) // size),
+                                         min(self.state.width, (rect.right - 1 + x) // size + 1))
+                for cy in range(max(0, (rect.top + y) // size),
+                                min(self.state.height, (rect.bottom - 1 + y) // size + 1))]
@@ -0,0 +1,286 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from engine import History, apply_move, direction_keys, parse_moves, run_moves, state_hash
+from levelpack import open_levels
+
+# Input recordings. A replay file is a normal move script (so engine.py can run it
+# too) with the level, logical tick stamps and the final state's hash in the header:
+#
+#   # prisn replay 1
+#   # level lvl_1
+#   # ticks 0 6*12 31 6*4     tick delta before each action, n*k = k actions n ticks apart
+#   # hash 9f86d08...         engine.state_hash() of the state the recording ended in
+#   1dddsd2sdd3sdd...
+#
+# A tick is 1/60 s of level time. Only the actions are needed to rebuild
+# the state, the ticks just let a rendered replay keep the original pacing.
+#   python replay.py verify                        # every replays/*.txt, headless
+#   python replay.py verify my_bug.txt -n 100      # ... 100 times each, for timing
+#   python replay.py play my_bug.txt --speed 4     # watch it at 4x (--speed 0: one action per frame)
+#   python replay.py make lvl_1 -m "1ddd2ww" -o replays/lvl_1.txt
+
+VERSION = 1
+REPLAY_DIR = 'replays'
+TICKS_PER_SECOND = 60
+TICKS_PER_MOVE = 6      # MOVE_DELAY (100ms)
+
+
+class Recorder:
+    # LevelScene calls record() for every select / move / reset. Ticks come from the
+    # clock rather than counting frames, the game loop doesn't run at a fixed rate
+    def __init__(self, level, directory, start_time):
+        self.level = level
+        self.directory = directory
+        self.start_time = start_time
+        self.last_tick = 0
+        self.actions = []
+        self.deltas = []
+
+    def record(self, action, current_time):
+        # action: '1'/'2'/'3', a direction tuple, 'z'/'y' (undo/redo) or 'r'; current_time in ms
+        tick = (current_time - self.start_time) * TICKS_PER_SECOND // 1000
+        self.actions.append(direction_keys.get(action, action))
+        self.deltas.append(tick - self.last_tick)
+        self.last_tick = tick
+
+    def save(self, state):
+        # -> path written
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.level}-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(self.directory, f"{self.level}-{time.strftime('%Y%m%d-%H%M%S')}-{n}.txt")
+        with open(path, 'w') as file:
+            file.write(format_replay(self.level, self.actions, self.deltas, state_hash(state)))
+        return path
+
+
+def encode_ticks(deltas):
+    tokens = []
+    i = 0
+    while i < len(deltas):
+        run = 1
+        while i + run < len(deltas) and deltas[i + run] == deltas[i]:
+            run += 1
+        tokens.append(f"{deltas[i]}*{run}" if run > 1 else str(deltas[i]))
+        i += run
+    return ' '.join(tokens)
+
+
+def decode_ticks(text):
+    deltas = []
+    for token in text.split():
+        delta, _, run = token.partition('*')
+        deltas.extend([int(delta)] * int(run or 1))
+    return deltas
+
+
+def format_replay(level, actions, deltas, final_hash, line_length=72):
+    lines = [f"# prisn replay {VERSION}", f"# level {level}", f"# ticks {encode_ticks(deltas)}",
+             f"# hash {final_hash}"]
+    script = ''.join(actions)
+    lines.extend(script[i:i + line_length] for i in range(0, len(script), line_length))
+    return '\n'.join(lines) + '\n'
+
+
+class Replay:
+    def __init__(self, level, script, deltas, final_hash):
+        self.level = level
+        self.script = script
+        self.actions = parse_moves(script)
+        if deltas is None:
+            deltas = [TICKS_PER_MOVE] * len(self.actions)
+        if len(deltas) != len(self.actions):
+            raise ValueError(f"{len(deltas)} tick stamps for {len(self.actions)} actions")
+        self.deltas = deltas
+        self.hash = final_hash
+
+    def ticks(self):
+        # -> absolute tick of every action
+        tick = 0
+        result = []
+        for delta in self.deltas:
+            tick += delta
+            result.append(tick)
+        return result
+
+
+def parse_replay(text):
+    header = {}
+    script_lines = []
+    for line in text.splitlines():
+        if line.startswith('#'):
+            key, _, value = line[1:].strip().partition(' ')
+            header[key] = value.strip()
+        else:
+            script_lines.append(line)
+    if 'level' not in header:
+        raise ValueError("replay has no '# level' line")
+    deltas = decode_ticks(header['ticks']) if 'ticks' in header else None
+    return Replay(header['level'], '\n'.join(script_lines), deltas, header.get('hash'))
+
+
+def load_replay(path):
+    with open(path, 'r') as file:
+        return parse_replay(file.read())
+
+
+def replay_headless(replay, levels):
+    # -> final state, as fast as the engine goes
+    state, _ = run_moves(levels.load(replay.level), replay.actions)
+    return state
+
+
+def verify(paths, levels, repeat=1):
+    # -> number of failures
+    failures = 0
+    for path in paths:
+        replay = load_replay(path)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            state = replay_headless(replay, levels)
+        elapsed = time.perf_counter() - start
+        final_hash = state_hash(state)
+        if replay.hash is None:
+            status = "no hash"
+        elif final_hash == replay.hash:
+            status = "ok"
+        else:
+            status = "MISMATCH"
+            failures += 1
+        won = "won" if state.won else "not won"
+        print(f"{path}: {status} ({replay.level}, {len(replay.actions)} actions, {won}, "
+              f"{elapsed / repeat * 1000:.2f} ms)")
+        if status == "MISMATCH":
+            print(f"    expected {replay.hash}\n    got      {final_hash}")
+    return failures
+
+
+def play(replay, levels, speed=1.0, cell_size=20, fps=TICKS_PER_SECOND):
+    # Rendered replay, `speed` ticks per frame (0 = one action per frame)
+    import pygame
+    from assets import sprites
+    from display import display
+    from render import Renderer
+
+    pygame.init()
+    initial_state = levels.load(replay.level)
+    screen = display.open(f"PRISN replay - {replay.level}")
+    sprites.load()
+
+    def start(initial_state):
+        state = initial_state.copy()
+        return state, Renderer(screen, state, cell_size)
+
+    state, renderer = start(initial_state)
+    history = History(state.width)
+    ticks = replay.ticks()
+    current_snake = 0
+    clock = pygame.time.Clock()
+    tick = 0.0
+    i = 0
+    while i < len(replay.actions) and not state.won:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return state
+            if event.type == pygame.VIDEORESIZE:
+                display.resized()
+        tick += speed
+        while i < len(replay.actions) and (ticks[i] <= tick or speed <= 0):
+            action, arg = replay.actions[i]
+            i += 1
+            if action == 'select':
+                if arg < len(state.snakes):
+                    current_snake = arg
+            elif action == 'move':
+                events = apply_move(state, current_snake, arg)
+                history.record(current_snake, events)
+                renderer.handle_events(events)
+                if state.won:
+                    break
+            elif action == 'undo':
+                renderer.handle_events(history.undo(state) or [])
+            elif action == 'redo':
+                renderer.handle_events(history.redo(state) or [])
+                if state.won:
+                    break
+            else:
+                state, renderer = start(initial_state)
+                history.clear()
+                # The game starts a reset level on snake 1 again
+                current_snake = 0
+            if speed <= 0:
+                break
+        display.present(renderer.draw(state.snakes, current_snake))
+        clock.tick(fps)
+
+    # Hold the last frame for a moment
+    pygame.time.wait(500)
+    pygame.quit()
+    return state
+
+
+def make(level, script, levels, spacing=TICKS_PER_MOVE):
+    # Replay text for a hand written / solver move script, evenly paced
+    actions = parse_moves(script)
+    replay = Replay(level, script, [spacing] * len(actions), None)
+    state = replay_headless(replay, levels)
+    return format_replay(level, (char for char in script if not char.isspace()), replay.deltas,
+                         state_hash(state)), state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify, play or make input replays")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = commands.add_parser('verify', help="replay headless and check the final state hash")
+    verify_parser.add_argument('paths', nargs='*', help=f"replay files (default: {REPLAY_DIR}/*.txt)")
+    verify_parser.add_argument('-n', '--repeat', type=int, default=1)
+
+    play_parser = commands.add_parser('play', help="watch a replay")
+    play_parser.add_argument('path')
+    play_parser.add_argument('--speed', type=float, default=1.0, help="1 = recorded pace, 0 = one action per frame")
+
+    make_parser = commands.add_parser('make', help="turn a move script into a replay file")
+    make_parser.add_argument('level', help="level name, e.g. lvl_1")
+    make_parser.add_argument('-m', '--moves', required=True)
+    make_parser.add_argument('-o', '--output', help="file to write (default: stdout)")
+    make_parser.add_argument('--spacing', type=int, default=TICKS_PER_MOVE, help="ticks between actions")
+    args = parser.parse_args(argv)
+
+    levels = open_levels()
+    if args.command == 'verify':
+        paths = args.paths or sorted(glob.glob(os.path.join(REPLAY_DIR, '*.txt')))
+        if not paths:
+            print(f"no replays in {REPLAY_DIR}/")
+            return 1
+        start = time.perf_counter()
+        failures = verify(paths, levels, args.repeat)
+        print(f"{len(paths) - failures}/{len(paths)} replays ok in {time.perf_counter() - start:.2f}s")
+        return 1 if failures else 0
+
+    if args.command == 'play':
+        replay = load_replay(args.path)
+        state = play(replay, levels, args.speed)
+        if replay.hash:
+            print("hash ok" if state_hash(state) == replay.hash else "hash MISMATCH")
+        return 0
+
+    text, state = make(args.level, args.moves, levels, args.spacing)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+        print(f"{args.output}: {'won' if state.won else 'not won'}")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
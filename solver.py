@@ -0,0 +1,485 @@
+import argparse
+import heapq
+import itertools
+import multiprocessing
+import sys
+import time
+from array import array
+from collections import deque
+
+from engine import (DIRECTIONS, CELL_WALL, CELL_BLOCK, CELL_SWITCH, CELL_GOAL, KIND_MASK, GameState,
+                    read_level, decode_cell, direction_keys, run_moves)
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+# Finds the shortest solution for a level with A*.
+#
+# A state key is (used switch mask, (length, head cell, ..., tail cell) per snake), so a
+# few million of them fit in the transposition table. Successors are generated from
+# tables precomputed off the engine's grid; every solution is replayed through the
+# engine before it is reported.
+#
+# The heuristic is a sum of per-snake lower bounds. A snake needs at least its
+# block-free distance to a goal, and if a block group has to go before some snake
+# can reach a goal, the snake(s) that can press its switch have to detour via one.
+# Moves only ever advance one snake by one cell so the sum never overestimates.
+#   python solver.py levels/lvl_1.txt
+#   python solver.py levels/lvl_*.txt --workers 8
+
+# Give up on ordering a snake's detours past this and just take the worst one
+MAX_ORDERED_VISITS = 4
+
+
+def bfs_distances(grid, width, height, starts, blocked):
+    distance = array('i', [-1]) * len(grid)
+    queue = deque()
+    for index in starts:
+        distance[index] = 0
+        queue.append(index)
+    while queue:
+        index = queue.popleft()
+        x, y = index % width, index // width
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = ny * width + nx
+                if distance[n] < 0 and not blocked(n):
+                    distance[n] = distance[index] + 1
+                    queue.append(n)
+    return distance
+
+
+class Level:
+    def __init__(self, state):
+        self.state = state
+        width, height = state.width, state.height
+        grid = state.grid
+        self.width = width
+        self.height = height
+        self.colour_keys = [snake.colour_key for snake in state.snakes]
+
+        # Block/switch groups are (colour key, id) pairs, switches get one bit each in the key
+        self.groups = []
+        group_index = {}
+        self.block_group = {}
+        self.switch_bit = {}
+        self.switch_group = []
+        self.switch_cells = []
+        self.goals = set()
+        for index, code in enumerate(grid):
+            kind, col_key, id_num = decode_cell(code)
+            if kind == CELL_GOAL:
+                self.goals.add(index)
+            elif kind in (CELL_BLOCK, CELL_SWITCH):
+                group = group_index.setdefault((col_key, id_num), len(self.groups))
+                if group == len(self.groups):
+                    self.groups.append((col_key, id_num))
+                if kind == CELL_BLOCK:
+                    self.block_group[index] = group
+                else:
+                    self.switch_bit[index] = 1 << len(self.switch_cells)
+                    self.switch_group.append(group)
+                    self.switch_cells.append(index)
+        # Snakes that can press each group's switches
+        self.pressers = []
+        for col_key, _ in self.groups:
+            members = col_key if isinstance(col_key, tuple) else (col_key,)
+            pressers = [i for i, key in enumerate(self.colour_keys) if key in members]
+            # A combined switch needs both of its colours in the level
+            self.pressers.append(pressers if len(pressers) == len(members) else [])
+        self.open_cache = {}
+        # The heuristic only looks at the heads, so bodies share entries
+        self.heuristic_cache = {}
+
+        walls = [code & KIND_MASK == CELL_WALL for code in grid]
+        self.walls = walls
+        self.goal_distance = bfs_distances(grid, width, height, self.goals, walls.__getitem__)
+        self.switch_distance = {index: bfs_distances(grid, width, height, [index], walls.__getitem__)
+                                for index in self.switch_cells}
+        # Cells that can still reach a goal while only this group's blocks stay shut
+        self.reach_without = {}
+        group_blocks = {}
+        for index, group in self.block_group.items():
+            group_blocks.setdefault(group, set()).add(index)
+        for group, cells in group_blocks.items():
+            blocked = lambda n, cells=cells: walls[n] or n in cells
+            distance = bfs_distances(grid, width, height, self.goals, blocked)
+            self.reach_without[group] = bytes(d >= 0 for d in distance)
+
+    def root(self):
+        width = self.width
+        bodies = []
+        for snake in self.state.snakes:
+            bodies.append((snake.length,) + tuple(y * width + x for x, y in snake.positions))
+        return (0,) + tuple(bodies)
+
+    def open_groups(self, mask):
+        # Groups whose blocks are gone, given the used switches
+        groups = self.open_cache.get(mask)
+        if groups is None:
+            groups = 0
+            for n, group in enumerate(self.switch_group):
+                if mask >> n & 1:
+                    groups |= 1 << group
+            self.open_cache[mask] = groups
+        return groups
+
+    def heuristic(self, key):
+        mask = key[0]
+        heads = tuple(body[1] for body in key[1:])
+        cache_key = (mask,) + heads
+        h = self.heuristic_cache.get(cache_key, -1)
+        if h == -1:
+            h = self.heuristic_cache[cache_key] = self.heads_heuristic(mask, heads)
+        return h
+
+    def heads_heuristic(self, mask, heads):
+        open_groups = self.open_groups(mask)
+
+        visits = [[] for _ in heads]
+        for group, reach in self.reach_without.items():
+            if open_groups >> group & 1:
+                continue
+            if all(reach[head] for head in heads):
+                continue
+            switches = [index for n, index in enumerate(self.switch_cells)
+                        if self.switch_group[n] == group and not mask >> n & 1]
+            if not switches or not self.pressers[group]:
+                return None
+            for i in self.pressers[group]:
+                visits[i].append(switches)
+
+        total = 0
+        for head, needed in zip(heads, visits):
+            if self.goal_distance[head] < 0:
+                return None
+            if not needed:
+                total += self.goal_distance[head]
+                continue
+            if len(needed) > MAX_ORDERED_VISITS:
+                orders = [[switches] for switches in needed]
+                combine = max
+            else:
+                orders = itertools.permutations(needed)
+                combine = min
+            best = None
+            for order in orders:
+                cost = self.path_cost(head, order)
+                if cost is not None:
+                    best = cost if best is None else combine(best, cost)
+            if best is None:
+                return None
+            total += best
+        return total
+
+    def path_cost(self, head, order):
+        # Shortest head -> one switch of each set in turn -> goal, walls only
+        costs = {head: 0}
+        for switches in order:
+            next_costs = {}
+            for index in switches:
+                distance = self.switch_distance[index]
+                options = [cost + distance[cell] for cell, cost in costs.items() if distance[cell] >= 0]
+                if options:
+                    next_costs[index] = min(options)
+            if not next_costs:
+                return None
+            costs = next_costs
+        options = [cost + self.goal_distance[cell] for cell, cost in costs.items() if self.goal_distance[cell] >= 0]
+        return min(options) if options else None
+
+    def successors(self, key):
+        # -> [(child key, (snake index, direction), won)]
+        width, height = self.width, self.height
+        mask = key[0]
+        bodies = key[1:]
+        open_groups = self.open_groups(mask)
+        children = []
+        for i, body in enumerate(bodies):
+            length = body[0]
+            cells = body[1:]
+            head = cells[0]
+            head_x, head_y = head % width, head // width
+            for direction in DIRECTIONS:
+                nx, ny = head_x + direction[0], head_y + direction[1]
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                n = ny * width + nx
+                if self.walls[n]:
+                    continue
+                group = self.block_group.get(n)
+                if group is not None and not open_groups >> group & 1:
+                    continue
+                # Tail moves out of the way unless the snake is still growing into it
+                if n in cells[:length - 1]:
+                    continue
+
+                new_bodies = list(bodies)
+                new_bodies[i] = (length, n) + cells[:length - 1]
+                new_mask = mask
+                bit = self.switch_bit.get(n)
+                if bit is not None and not mask & bit:
+                    col_key = self.groups[self.switch_group[bit.bit_length() - 1]][0]
+                    if col_key == self.colour_keys[i]:
+                        new_mask |= bit
+                        new_bodies[i] = (length + 1,) + new_bodies[i][1:]
+                    elif isinstance(col_key, tuple):
+                        cols_at_pos = set(self.colour_keys[j] for j, other in enumerate(new_bodies)
+                                          if other[1] == n)
+                        if cols_at_pos == set(col_key):
+                            new_mask = self.press_combination(new_bodies, new_mask, bit)
+                # Leaving a combination switch can leave exactly its two heads on it
+                bit = self.switch_bit.get(head)
+                if bit is not None and not new_mask & bit:
+                    col_key = self.groups[self.switch_group[bit.bit_length() - 1]][0]
+                    if isinstance(col_key, tuple):
+                        cols_at_pos = set(self.colour_keys[j] for j, other in enumerate(new_bodies)
+                                          if other[1] == head)
+                        if cols_at_pos == set(col_key):
+                            new_mask = self.press_combination(new_bodies, new_mask, bit)
+                won = all(other[1] in self.goals for other in new_bodies)
+                children.append(((new_mask,) + tuple(new_bodies), (i, direction), won))
+        return children
+
+    def press_combination(self, bodies, mask, bit):
+        # Grows the combination's snakes in `bodies` (in place) -> mask with the switch pressed
+        col_key = self.groups[self.switch_group[bit.bit_length() - 1]][0]
+        for j, other in enumerate(bodies):
+            if self.colour_keys[j] in col_key:
+                bodies[j] = (other[0] + 1,) + other[1:]
+        return mask | bit
+
+    def expand(self, key):
+        # successors() with their heuristic, dead ends dropped
+        children = []
+        for child, move, won in self.successors(key):
+            h = 0 if won else self.heuristic(child)
+            if h is not None:
+                children.append((child, move, won, h))
+        return children
+
+
+def moves_to_script(moves):
+    # Same format the engine CLI reads
+    script = []
+    current = None
+    for snake_index, direction in moves:
+        if snake_index != current:
+            script.append(str(snake_index + 1))
+            current = snake_index
+        script.append(direction_keys[direction])
+    return ''.join(script)
+
+
+def rebuild_path(parents, key):
+    moves = []
+    while parents[key] is not None:
+        key, move = parents[key]
+        moves.append(move)
+    moves.reverse()
+    return moves
+
+
+class Result:
+    def __init__(self, moves, nodes, elapsed, table_size, optimal=True):
+        self.moves = moves
+        self.optimal = optimal
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.table_size = table_size
+
+    @property
+    def solved(self):
+        return self.moves is not None
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0
+
+
+class Search:
+    # A* bookkeeping shared by the single and multi-process drivers
+    def __init__(self, level, weight=1):
+        self.start = time.perf_counter()
+        self.weight = weight
+        root = level.root()
+        self.best_g = {root: 0}
+        self.parents = {root: None}
+        self.wins = set()
+        self.frontier = []
+        self.counter = 0
+        self.nodes = 0
+        self.batch_f = 0
+        h = level.heuristic(root)
+        if h == 0:
+            self.wins.add(root)
+        if h is not None:
+            self.push(root, 0, h)
+
+    def push(self, key, g, h):
+        # Ties go to the deepest node
+        heapq.heappush(self.frontier, (g + self.weight * h, -g, self.counter, key))
+        self.counter += 1
+
+    def pop_batch(self, size):
+        # -> (up to size best open nodes, winning key if one comes off the heap first)
+        # A batch only holds nodes with the same f, and a win is only taken once it is
+        # the cheapest open entry, which keeps the answer optimal however many nodes each
+        # batch expands.
+        batch = []
+        while self.frontier and len(batch) < size:
+            f, neg_g, _, key = self.frontier[0]
+            if batch and f != self.batch_f:
+                break
+            heapq.heappop(self.frontier)
+            if -neg_g > self.best_g[key]:
+                continue
+            if key in self.wins:
+                return batch, key
+            self.batch_f = f
+            batch.append((key, -neg_g))
+        return batch, None
+
+    def merge(self, key, g, children):
+        # -> True if a new child is no worse than the batch (the search goes on down from it)
+        self.nodes += 1
+        diving = False
+        for child, move, won, h in children:
+            child_g = g + 1
+            if child_g >= self.best_g.get(child, child_g + 1):
+                continue
+            self.best_g[child] = child_g
+            self.parents[child] = (key, move)
+            if won:
+                self.wins.add(child)
+            self.push(child, child_g, h)
+            diving |= child_g + self.weight * h <= self.batch_f
+        return diving
+
+    def result(self, won_key=None):
+        moves = rebuild_path(self.parents, won_key) if won_key is not None else None
+        return Result(moves, self.nodes, time.perf_counter() - self.start, len(self.best_g), self.weight == 1)
+
+
+def astar(level, max_nodes=None, weight=1):
+    search = Search(level, weight)
+    while search.frontier:
+        if max_nodes and search.nodes >= max_nodes:
+            break
+        batch, won_key = search.pop_batch(1)
+        if won_key is not None:
+            return search.result(won_key)
+        for key, g in batch:
+            search.merge(key, g, level.expand(key))
+    return search.result()
+
+
+# ////////////////// Multi-process frontier ////////////////// #
+
+worker_level = None
+
+
+def init_worker(symbol_data, id_data):
+    global worker_level
+    worker_level = Level(GameState.from_level(symbol_data, id_data))
+
+
+def expand_chunk(keys):
+    return [worker_level.expand(key) for key in keys]
+
+
+def parallel_astar(symbol_data, id_data, workers, max_nodes=None, weight=1, chunk_size=64):
+    # Same search, with the open nodes of the best f expanded across the pool and
+    # merged back here. While the search dives down from the node it just expanded it
+    # goes one node at a time like astar(), anything more would be expanding nodes the
+    # serial search never gets to. When a dive dead-ends the rest of that f has to be
+    # gone through anyway, so the batch doubles each round (up to workers * chunk_size)
+    # until a dive starts again.
+    level = Level(GameState.from_level(symbol_data, id_data))
+    search = Search(level, weight)
+    size = 1
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(symbol_data, id_data)) as pool:
+        while search.frontier:
+            if max_nodes and search.nodes >= max_nodes:
+                break
+            batch, won_key = search.pop_batch(size)
+            if won_key is not None:
+                return search.result(won_key)
+            if len(batch) < chunk_size:
+                # Not worth the round trip
+                expanded = [level.expand(key) for key, _ in batch]
+            else:
+                chunks = [[key for key, _ in batch[n:n + chunk_size]] for n in range(0, len(batch), chunk_size)]
+                expanded = [children for chunk in pool.map(expand_chunk, chunks) for children in chunk]
+            diving = False
+            for (key, g), children in zip(batch, expanded):
+                diving |= search.merge(key, g, children)
+            size = 1 if diving else min(workers * chunk_size, size * 2)
+    return search.result()
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage = max(usage, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return usage / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def solve(symbol_data, id_data, workers=1, max_nodes=None, weight=1):
+    if workers > 1:
+        result = parallel_astar(symbol_data, id_data, workers, max_nodes, weight)
+    else:
+        result = astar(Level(GameState.from_level(symbol_data, id_data)), max_nodes, weight)
+    if result.solved:
+        # The search has its own copy of the rules, make sure the engine agrees
+        initial_state = GameState.from_level(symbol_data, id_data)
+        state, _ = run_moves(initial_state, [('select', i) if n % 2 == 0 else ('move', direction)
+                                             for i, direction in result.moves for n in (0, 1)])
+        if not state.won:
+            raise RuntimeError("solver and engine disagree on the solution")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the shortest solution for levels")
+    parser.add_argument('levels', nargs='+', help="levels/lvl_N.txt files")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="expand the frontier over this many processes")
+    parser.add_argument('--max-nodes', type=int, default=None, help="give up after expanding this many states")
+    parser.add_argument('--max-moves', type=int, default=None, help="fail levels whose solution is longer")
+    parser.add_argument('-w', '--weight', type=float, default=1,
+                        help="weighted A*: faster, solution at most this many times longer than optimal")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for level_path in args.levels:
+        try:
+            symbol_data, id_data = read_level(level_path)
+        except FileNotFoundError as e:
+            print(f"{level_path}: '{e.filename}' missing")
+            failed = True
+            continue
+        result = solve(symbol_data, id_data, args.workers, args.max_nodes, args.weight)
+        memory = peak_memory_mb()
+        memory = f"{memory:.1f} MB" if memory is not None else "n/a"
+        stats = (f"{result.nodes} nodes, {result.nodes_per_second:.0f} nodes/s, "
+                 f"{result.table_size} states, {result.elapsed:.2f}s, peak {memory}")
+        if result.solved:
+            kind = "moves" if result.optimal else "moves, not necessarily optimal"
+            print(f"{level_path}: {len(result.moves)} {kind} ({stats})")
+            print(f"    {moves_to_script(result.moves)}")
+            if args.max_moves is not None and len(result.moves) > args.max_moves:
+                failed = True
+        else:
+            print(f"{level_path}: no solution ({stats})")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())